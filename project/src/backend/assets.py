@@ -0,0 +1,79 @@
+import hashlib
+import io
+import os
+
+from db import db
+from models import Narrative
+
+# Narrative illustrations are resized into WebP variants with content-hashed
+# file names, so they can be served with a one-year cache lifetime. Variant
+# metadata is stored in narratives.image_variants and sent with /narratives.
+
+ASSET_DIR = os.getenv("ASSET_DIR", os.path.join(os.path.dirname(__file__), "assets"))
+# image_path is relative to the frontend's public/ directory
+ASSET_SOURCE_DIR = os.getenv("ASSET_SOURCE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "public"))
+ASSET_URL_PREFIX = "/assets"
+DEFAULT_WIDTHS = (320, 640, 960)
+DEFAULT_QUALITY = 80
+
+
+def render_variant(image, width, quality):
+    from PIL import Image
+
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), Image.LANCZOS)
+    buf = io.BytesIO()
+    image.save(buf, "WEBP", quality=quality, method=6)
+    return image.size, buf.getvalue()
+
+
+def source_path(narrative):
+    return os.path.join(ASSET_SOURCE_DIR, narrative.image_path.lstrip("/"))
+
+
+def build_variants(narrative, widths=DEFAULT_WIDTHS, quality=DEFAULT_QUALITY):
+    from PIL import Image
+
+    with Image.open(source_path(narrative)) as source:
+        source.load()
+    image = source.convert("RGBA" if source.mode in ("RGBA", "LA", "P") else "RGB")
+
+    # Never upscale; a small source just gets one variant at its own width
+    targets = sorted({min(width, image.width) for width in widths})
+    variants = []
+    for width in targets:
+        (w, h), data = render_variant(image, width, quality)
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        filename = f"{narrative.id}-{w}w.{digest}.webp"
+        path = os.path.join(ASSET_DIR, filename)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        variants.append({
+            "url": f"{ASSET_URL_PREFIX}/{filename}",
+            "width": w,
+            "height": h,
+            "bytes": len(data),
+            "type": "image/webp",
+        })
+    return variants
+
+
+def build_all(widths=DEFAULT_WIDTHS, quality=DEFAULT_QUALITY, force=False):
+    """Build variants for every narrative with an image; returns (built, skipped, missing)."""
+    os.makedirs(ASSET_DIR, exist_ok=True)
+    built, skipped, missing = [], [], []
+    for narrative in db.session.query(Narrative).order_by(Narrative.id):
+        if not narrative.image_path:
+            continue
+        if narrative.image_variants and not force:
+            skipped.append(narrative.id)
+            continue
+        if not os.path.exists(source_path(narrative)):
+            missing.append(narrative.id)
+            continue
+        narrative.image_variants = build_variants(narrative, widths, quality)
+        built.append(narrative.id)
+    db.session.commit()
+    return built, skipped, missing
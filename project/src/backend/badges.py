@@ -0,0 +1,83 @@
+from db import db
+from models import Badge, BadgeRule, UserBadge
+from scoring import credit_badges
+import os
+import threading
+import time
+
+# Badge rules are rows in badge_rules, evaluated against the per-user counters
+# maintained in stats.py (see stats.counters). Awarding is then one lookup of
+# earned badges plus in-memory comparisons. Each process reloads the rules
+# (and badge points) after BADGE_RULES_TTL_SECONDS, so edits made from
+# another process show up without a restart.
+
+RULES_TTL_SECONDS = float(os.getenv("BADGE_RULES_TTL_SECONDS", "60"))
+
+METRICS = {
+    "correct_count": lambda rule, counters: counters["correct_count"] >= rule["threshold"],
+    "correct_score": lambda rule, counters: counters["correct_score"] >= rule["threshold"],
+    "distinct_emotions": lambda rule, counters: len(counters["emotions"]) >= rule["threshold"],
+    "emotion": lambda rule, counters: rule["emotion"] in counters["emotions"],
+}
+
+# Original hard-coded rules; used to seed badge_rules and as a fallback
+# until it has been seeded
+DEFAULT_BADGE_RULES = [
+    {"badge_id": 1, "metric": "correct_count", "threshold": 1},
+    {"badge_id": 2, "metric": "correct_count", "threshold": 5},
+    {"badge_id": 3, "metric": "correct_count", "threshold": 10},
+    {"badge_id": 4, "metric": "correct_count", "threshold": 20},
+    {"badge_id": 5, "metric": "correct_score", "threshold": 100},
+    {"badge_id": 6, "metric": "correct_score", "threshold": 200},
+    {"badge_id": 7, "metric": "correct_score", "threshold": 500},
+    {"badge_id": 8, "metric": "correct_score", "threshold": 1000},
+    {"badge_id": 9, "metric": "distinct_emotions", "threshold": 3},
+    {"badge_id": 10, "metric": "distinct_emotions", "threshold": 6},
+    {"badge_id": 11, "metric": "emotion", "emotion": "happy"},
+    {"badge_id": 12, "metric": "emotion", "emotion": "envy"},
+]
+
+_rules = None
+_loaded_at = 0.0
+_rules_lock = threading.Lock()
+
+
+def _stale():
+    return _rules is None or time.monotonic() - _loaded_at >= RULES_TTL_SECONDS
+
+
+def load_rules():
+    global _rules, _loaded_at
+    if _stale():
+        with _rules_lock:
+            if _stale():
+                points = dict(db.session.query(Badge.id, Badge.points).all())
+                rows = db.session.query(BadgeRule).all()
+                definitions = [
+                    {"badge_id": r.badge_id, "metric": r.metric, "threshold": r.threshold, "emotion": r.emotion}
+                    for r in rows
+                ] or DEFAULT_BADGE_RULES
+                _rules = [
+                    {"threshold": None, "emotion": None, **rule, "points": points.get(rule["badge_id"], 0)}
+                    for rule in definitions
+                    if rule["badge_id"] in points and rule["metric"] in METRICS
+                ]
+                _loaded_at = time.monotonic()
+    return _rules
+
+
+def invalidate_rules():
+    global _rules
+    _rules = None
+
+
+def award_badges(user_id, counters):
+    earned = {badge_id for (badge_id,) in db.session.query(UserBadge.badge_id).filter_by(user_id=user_id)}
+    new = [rule for rule in load_rules()
+           if rule["badge_id"] not in earned and METRICS[rule["metric"]](rule, counters)]
+    if not new:
+        return []
+
+    db.session.add_all([UserBadge(user_id=user_id, badge_id=rule["badge_id"]) for rule in new])
+    credit_badges(user_id, [(rule["badge_id"], rule["points"]) for rule in new])
+    return [rule["badge_id"] for rule in new]
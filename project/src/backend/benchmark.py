@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Latency/throughput benchmark for the emotion endpoints.
+#
+#   python benchmark.py --mode inprocess --output bench.json
+#   python benchmark.py --mode http --url http://localhost:5000
+#   python benchmark.py --compare eager,int8,torchscript --output bench.json
+#
+# Batch size 1 drives /predict with that many concurrent callers (exercising
+# the micro-batcher); larger sizes post one /predict/batch of that many answers.
+# Answers are sampled fresh for every request so the prediction cache doesn't
+# hide model cost.
+
+WORDS = (
+    "aku dia merasa sedih senang marah takut malu iri karena temanku ibu ayah adik kakak "
+    "mainan sepeda sekolah hadiah rusak hilang pindah jatuh menangis tertawa dimarahi guru "
+    "kucing hujan gelap ulang tahun baru teman main bola lomba kalah menang sendirian"
+).split()
+
+# Rough shape of real answers: mostly 1-5 words, a tail of longer sentences
+LENGTH_WEIGHTS = [(1, 20), (2, 25), (3, 15), (5, 15), (8, 10), (12, 8), (20, 5), (40, 2)]
+
+DEFAULT_BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+
+# Environment for each --compare entry; each runs in its own subprocess
+VARIANTS = {
+    "eager": {"EMOTION_BACKEND": "eager"},
+    "int8": {"EMOTION_BACKEND": "eager", "EMOTION_QUANTIZE": "int8"},
+    "torchscript": {"EMOTION_BACKEND": "torchscript"},
+    "onnx": {"EMOTION_BACKEND": "onnx"},
+}
+
+
+def sample_answer(rng):
+    lengths, weights = zip(*LENGTH_WEIGHTS)
+    n = rng.choices(lengths, weights)[0]
+    return " ".join(rng.choice(WORDS) for _ in range(n)) + f" {rng.randrange(10**6)}"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class InProcessTarget:
+    def __init__(self):
+        os.environ.setdefault("EMOTION_CACHE_SIZE", "0")
+        from flask import Flask
+        from routes.emotion import emotion
+        import inference
+
+        app = Flask(__name__)
+        app.register_blueprint(emotion)
+        self.app = app
+        inference.warm_up(background=False)
+
+    def post(self, path, payload):
+        with self.app.test_client() as client:
+            response = client.post(path, json=payload)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)}")
+            return response.get_json()
+
+    def peak_rss_mb(self):
+        from inference_metrics import peak_rss_mb
+        return peak_rss_mb()
+
+
+class HttpTarget:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def post(self, path, payload):
+        request = urllib.request.Request(
+            self.url + path,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return json.load(response)
+
+    def peak_rss_mb(self):
+        # The server's, not ours; with several workers it's whichever one answers
+        with urllib.request.urlopen(self.url + "/predict/metrics", timeout=60) as response:
+            return json.load(response).get("peak_rss_mb")
+
+
+def run_batch_size(target, batch_size, requests, rng):
+    latencies = []
+
+    def single(text):
+        started = time.perf_counter()
+        target.post("/predict", {"text": text})
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    if batch_size == 1:
+        texts = [sample_answer(rng) for _ in range(requests)]
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            list(pool.map(single, texts))
+        items = requests
+    else:
+        for _ in range(requests):
+            texts = [sample_answer(rng) for _ in range(batch_size)]
+            call_started = time.perf_counter()
+            target.post("/predict/batch", {"texts": texts})
+            latencies.append(time.perf_counter() - call_started)
+        items = requests * batch_size
+    elapsed = time.perf_counter() - started
+
+    return {
+        "batch_size": batch_size,
+        "requests": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "requests_per_second": len(latencies) / elapsed,
+        "items_per_second": items / elapsed,
+        # Process high-water mark so far, so it covers earlier batch sizes too
+        "peak_rss_mb": target.peak_rss_mb(),
+    }
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    target = HttpTarget(args.url) if args.mode == "http" else InProcessTarget()
+
+    # Warm-up requests aren't measured
+    target.post("/predict", {"text": "halo"})
+
+    results = []
+    for batch_size in args.batch_sizes:
+        results.append(run_batch_size(target, batch_size, args.requests, rng))
+        print(f"batch={batch_size}: p50={results[-1]['p50_ms']:.1f}ms "
+              f"p99={results[-1]['p99_ms']:.1f}ms items/s={results[-1]['items_per_second']:.1f} "
+              f"rss={results[-1]['peak_rss_mb']}MB",
+              file=sys.stderr)
+
+    return {
+        "mode": args.mode,
+        "backend": os.getenv("EMOTION_BACKEND", "eager"),
+        "quantize": os.getenv("EMOTION_QUANTIZE") or None,
+        "requests_per_batch_size": args.requests,
+        "results": results,
+    }
+
+
+def compare(args):
+    report = {"timestamp": time.time(), "variants": {}}
+    for name in args.compare:
+        env = {**os.environ, **VARIANTS[name]}
+        cmd = [sys.executable, __file__, "--mode", "inprocess", "--requests", str(args.requests),
+               "--seed", str(args.seed), "--batch-sizes", ",".join(map(str, args.batch_sizes))]
+        print(f"== {name}", file=sys.stderr)
+        output = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        sys.stderr.write(output.stderr)
+        report["variants"][name] = json.loads(output.stdout)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the emotion endpoints")
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--requests", type=int, default=50, help="requests per batch size")
+    parser.add_argument("--batch-sizes", type=lambda s: [int(x) for x in s.split(",")],
+                        default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--compare", type=lambda s: s.split(","),
+                        help=f"comma-separated variants to run in-process: {', '.join(VARIANTS)}")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.compare:
+        unknown = [name for name in args.compare if name not in VARIANTS]
+        if unknown:
+            parser.error(f"unknown variants: {', '.join(unknown)}")
+        report = compare(args)
+    else:
+        report = run(args)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
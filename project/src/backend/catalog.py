@@ -0,0 +1,91 @@
+import hashlib
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from db import db
+from models import Narrative, CatalogVersion
+
+# Narratives only change when authors publish, so each segment's /narratives
+# payload is serialized once per catalog version and kept in memory with its
+# ETag. Publishing bumps the version row; workers notice within
+# CATALOG_VERSION_CHECK_SECONDS and rebuild on the next request.
+
+VERSION_CHECK_SECONDS = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "5"))
+
+_lock = threading.Lock()
+_version = None
+_checked_at = 0.0
+_segments = {}  # segment -> (body bytes, etag)
+
+
+def current_version():
+    return db.session.query(CatalogVersion.version).filter_by(id=1).scalar() or 0
+
+
+def _serialize(segment):
+    rows = db.session.query(Narrative).filter_by(segment=segment).order_by(Narrative.id).all()
+    body = current_app.json.dumps([
+        {
+            "id": row.id,
+            "title": row.title,
+            "text": row.content,
+            "image_path": row.image_path,
+            "image_variants": row.image_variants or [],
+            "expectedEmotions": row.emotion_labels,
+            "segment": row.segment,
+        }
+        for row in rows
+    ]).encode()
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+def _refresh_version():
+    global _version, _checked_at
+    now = time.monotonic()
+    if _version is not None and now - _checked_at < VERSION_CHECK_SECONDS:
+        return
+    version = current_version()
+    if version != _version:
+        _segments.clear()
+        _version = version
+    _checked_at = now
+
+
+def get_segment(segment):
+    """Return (body, etag) for a segment's narrative list."""
+    with _lock:
+        _refresh_version()
+        if segment not in _segments:
+            _segments[segment] = _serialize(segment)
+        return _segments[segment]
+
+
+def load(segments=(1, 2)):
+    for segment in segments:
+        get_segment(segment)
+
+
+def publish():
+    """Bump the catalog version so every worker rebuilds its payloads."""
+    stmt = insert(CatalogVersion).values(id=1, version=1, published_at=func.now())
+    version = db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CatalogVersion.id],
+            set_={"version": CatalogVersion.version + 1, "published_at": func.now()},
+        ).returning(CatalogVersion.version)
+    ).scalar()
+    db.session.commit()
+    invalidate()
+    return version
+
+
+def invalidate():
+    global _version
+    with _lock:
+        _segments.clear()
+        _version = None
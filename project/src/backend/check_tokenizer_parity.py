@@ -0,0 +1,56 @@
+import argparse
+import sys
+
+from inference import MODEL_PATH
+from tokenization import fast_encode_fn, slow_encode_fn
+from prediction_cache import normalize_text
+
+# Checks that the served encoding (normalize_text, then the fast Rust
+# tokenizer) produces the same input IDs as the original path, which fed the
+# raw answer to transformers' BertTokenizer.
+#
+#   python check_tokenizer_parity.py [answers.txt]
+#
+# The optional file holds one answer per line; a built-in sample is always checked.
+
+SAMPLES = [
+    "sedih",
+    "Dia marah!",
+    "aku merasa senang karena dapat hadiah dari ibu",
+    "Budi iri sama temannya yang punya sepeda baru...",
+    "  takut   gelap  ",
+    "malu banget 😳",
+    "Énak sekali, café-nya ramai",
+    "dia kecewa, sedih, dan marah karena mainannya rusak (padahal baru dibeli kemarin)",
+    "",
+    # NFKC folds these; a mismatch means normalization changed the encoding
+    "ｓｅｄｉｈ",
+    "di²",
+    "ﬁlm sedih",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fast and slow tokenizer encodings")
+    parser.add_argument("texts", nargs="?", help="file with one answer per line")
+    args = parser.parse_args()
+
+    texts = list(SAMPLES)
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            texts.extend(line.rstrip("\n") for line in f)
+
+    fast, slow = fast_encode_fn(MODEL_PATH), slow_encode_fn(MODEL_PATH)
+    mismatches = 0
+    for text in texts:
+        a, b = fast(normalize_text(text)), slow(text)
+        if a != b:
+            mismatches += 1
+            print(f"MISMATCH {text!r}\n  fast: {a}\n  slow: {b}")
+
+    print(f"{len(texts) - mismatches}/{len(texts)} encodings match")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
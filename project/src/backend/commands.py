@@ -0,0 +1,283 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, text
+
+from db import db
+from models import User, Response, Badge, UserBadge, ScoreLedgerEntry, BadgeRule, Narrative
+import badges
+import stats
+import migrate
+import catalog
+import assets
+import feedback_jobs
+import feedback_cache
+from scoring import normalize_label
+
+# Maintenance commands, run with e.g. `flask --app app reconcile-scores`
+
+
+def register_commands(app):
+    app.cli.add_command(reconcile_scores)
+    app.cli.add_command(seed_badge_rules)
+    app.cli.add_command(rebuild_stats)
+    app.cli.add_command(db_migrate)
+    app.cli.add_command(check_query_plans)
+    app.cli.add_command(publish_narratives)
+    app.cli.add_command(build_images)
+    app.cli.add_command(feedback_worker)
+    app.cli.add_command(pregenerate_feedback)
+
+
+def _totals_by_user(query):
+    return {user_id: total or 0 for user_id, total in query.all()}
+
+
+@click.command("reconcile-scores")
+@click.option("--fix", is_flag=True, help="Reset mismatched totals and record the difference in the ledger")
+@with_appcontext
+def reconcile_scores(fix):
+    """Check users.total_score and the score ledger against responses + badges."""
+    response_scores = _totals_by_user(
+        db.session.query(Response.user_id, func.sum(Response.score))
+        .filter(Response.is_correct == True)
+        .group_by(Response.user_id)
+    )
+    badge_scores = _totals_by_user(
+        db.session.query(UserBadge.user_id, func.sum(Badge.points))
+        .join(Badge, UserBadge.badge_id == Badge.id)
+        .group_by(UserBadge.user_id)
+    )
+    ledger_totals = _totals_by_user(
+        db.session.query(ScoreLedgerEntry.user_id, func.sum(ScoreLedgerEntry.delta))
+        .group_by(ScoreLedgerEntry.user_id)
+    )
+
+    mismatches = 0
+    for user in db.session.query(User).order_by(User.id):
+        expected = response_scores.get(user.id, 0) + badge_scores.get(user.id, 0)
+        stored = user.total_score or 0
+        ledger = ledger_totals.get(user.id, 0)
+        if stored == expected and ledger == expected:
+            continue
+
+        mismatches += 1
+        click.echo(f"user {user.id}: expected {expected}, total_score {stored}, ledger {ledger}")
+        if fix:
+            if ledger != expected:
+                db.session.add(ScoreLedgerEntry(user_id=user.id, delta=expected - ledger, reason="reconcile"))
+            user.total_score = expected
+
+    if fix:
+        db.session.commit()
+        click.echo(f"Fixed {mismatches} user(s)")
+    elif mismatches:
+        raise click.ClickException(f"{mismatches} user(s) out of sync (rerun with --fix)")
+    else:
+        click.echo("All scores reconcile")
+
+
+@click.command("seed-badge-rules")
+@click.option("--replace", is_flag=True, help="Overwrite existing rule rows with the defaults")
+@with_appcontext
+def seed_badge_rules(replace):
+    """Store the default badge rules in badge_rules."""
+    added = 0
+    for rule in badges.DEFAULT_BADGE_RULES:
+        existing = db.session.get(BadgeRule, rule["badge_id"])
+        if existing and not replace:
+            continue
+        if existing:
+            db.session.delete(existing)
+            db.session.flush()
+        db.session.add(BadgeRule(**rule))
+        added += 1
+    db.session.commit()
+    badges.invalidate_rules()
+    click.echo(f"Stored {added} badge rule(s)")
+
+
+@click.command("rebuild-stats")
+@click.option("--user-id", type=int, help="Only rebuild this user")
+@with_appcontext
+def rebuild_stats(user_id):
+    """Backfill user_progress and user_emotion_stats from the responses table."""
+    query = db.session.query(User.id).order_by(User.id)
+    if user_id:
+        query = query.filter(User.id == user_id)
+    user_ids = [uid for (uid,) in query]
+    for uid in user_ids:
+        stats.rebuild_user_stats(uid)
+        db.session.commit()
+    click.echo(f"Rebuilt statistics for {len(user_ids)} user(s)")
+
+
+@click.command("db-migrate")
+@click.option("--status", is_flag=True, help="List pending migrations without applying them")
+@with_appcontext
+def db_migrate(status):
+    """Create missing tables and apply pending migrations/*.sql."""
+    if status:
+        pending = migrate.pending_migrations()
+        click.echo("\n".join(pending) if pending else "No pending migrations")
+        return
+    done = migrate.apply_migrations()
+    for version in done:
+        click.echo(f"Applied {version}")
+    click.echo(f"{len(done)} migration(s) applied")
+
+
+# Hot queries and the index each must be able to use. Sequential scans are
+# disabled while explaining so small dev/CI tables still show whether the
+# index is usable at all.
+QUERY_PLAN_CHECKS = [
+    ("response history page",
+     "SELECT id FROM responses WHERE user_id = :uid ORDER BY created_at DESC, id DESC LIMIT 50",
+     "ix_responses_user_created"),
+    ("already answered correctly",
+     "SELECT id FROM responses WHERE user_id = :uid AND narrative_id = :nid AND is_correct = true",
+     "ix_responses_user_narrative_correct"),
+    ("responses per user",
+     "SELECT count(*) FROM responses WHERE user_id = :uid",
+     ("ix_responses_user_created", "ix_responses_user_narrative_correct")),
+    ("emotion containment",
+     "SELECT id FROM responses WHERE predicted_emotion @> ARRAY[:emotion]::text[]",
+     "ix_responses_predicted_emotion"),
+    ("kids of a mentor",
+     "SELECT id FROM users WHERE parent_id = :uid",
+     "ix_users_parent_id"),
+    ("earned badge lookup",
+     "SELECT id FROM user_badges WHERE user_id = :uid AND badge_id = :bid",
+     "uq_user_badges_user_badge"),
+]
+
+
+def _plan_indexes(plan):
+    found = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+
+@click.command("check-query-plans")
+@with_appcontext
+def check_query_plans():
+    """EXPLAIN the hot queries and fail if any no longer uses its index."""
+    params = {"uid": 1, "nid": "A1", "emotion": "happy", "bid": 1}
+    failures = 0
+    with db.engine.connect() as conn:
+        with conn.begin():
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            for name, sql, expected in QUERY_PLAN_CHECKS:
+                expected = (expected,) if isinstance(expected, str) else expected
+                plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql), params).scalar()
+                used = _plan_indexes(plan[0]["Plan"])
+                ok = bool(used & set(expected))
+                failures += not ok
+                click.echo(f"{'ok  ' if ok else 'FAIL'} {name}: {', '.join(sorted(used)) or 'no index'}")
+    if failures:
+        raise click.ClickException(f"{failures} query plan(s) not using the expected index")
+
+
+@click.command("publish-narratives")
+@with_appcontext
+def publish_narratives():
+    """Bump the narrative catalog version after editing narratives."""
+    click.echo(f"Catalog version {catalog.publish()}")
+
+
+@click.command("build-images")
+@click.option("--widths", default=",".join(str(w) for w in assets.DEFAULT_WIDTHS), help="Comma-separated variant widths")
+@click.option("--quality", type=int, default=assets.DEFAULT_QUALITY, help="WebP quality (0-100)")
+@click.option("--force", is_flag=True, help="Rebuild narratives that already have variants")
+@with_appcontext
+def build_images(widths, quality, force):
+    """Build resized WebP variants of narrative images and publish them."""
+    widths = [int(w) for w in widths.split(",") if w.strip()]
+    built, skipped, missing = assets.build_all(widths, quality, force)
+    for narrative_id in missing:
+        click.echo(f"{narrative_id}: source image not found")
+    if built:
+        catalog.publish()
+    click.echo(f"Built {len(built)}, skipped {len(skipped)}, missing {len(missing)}")
+
+
+@click.command("feedback-worker")
+@click.option("--threads", type=int, default=feedback_jobs.WORKERS, help="Concurrent feedback jobs")
+@with_appcontext
+def feedback_worker(threads):
+    """Run feedback jobs from the feedback_jobs table until interrupted."""
+    if feedback_jobs.QUEUE_BACKEND != "db":
+        raise click.ClickException("A separate worker needs FEEDBACK_QUEUE=db")
+    pool = feedback_jobs.start_workers(current_app._get_current_object(), threads)
+    click.echo(f"Running {threads} feedback worker(s)")
+    try:
+        for thread in pool.threads:
+            thread.join()
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+def _common_answers(top, min_count, segment):
+    # Most frequent answer classes per (narrative, correctness) in the history
+    labels = feedback_cache.CACHE_KEY == "labels"
+    answer_class = Response.predicted_emotion if labels else func.lower(func.trim(Response.user_answer))
+    ranked = (
+        db.session.query(
+            Response.narrative_id,
+            Response.is_correct,
+            func.min(Response.user_answer).label("answer"),
+            func.min(Response.predicted_emotion).label("predicted"),
+            func.row_number().over(
+                partition_by=(Response.narrative_id, Response.is_correct),
+                order_by=func.count().desc(),
+            ).label("rank"),
+        )
+        .join(Narrative, Narrative.id == Response.narrative_id)
+        .group_by(Response.narrative_id, Response.is_correct, answer_class)
+        .having(func.count() >= min_count)
+    )
+    if segment:
+        ranked = ranked.filter(Narrative.segment == segment)
+    ranked = ranked.subquery()
+    return db.session.query(ranked).filter(ranked.c.rank <= top).order_by(ranked.c.narrative_id).all()
+
+
+@click.command("pregenerate-feedback")
+@click.option("--top", type=int, default=5, help="Answer classes per narrative and correctness")
+@click.option("--min-count", type=int, default=2, help="Only answers given at least this often")
+@click.option("--segment", type=int, help="Only narratives of this segment")
+@with_appcontext
+def pregenerate_feedback(top, min_count, segment):
+    """Fill the feedback cache for common answers ahead of a class session."""
+    from routes.gpt_feedback import generate_feedback, cached_feedback
+
+    narratives = {n.id: n for n in db.session.query(Narrative)}
+    jobs = [
+        (narratives[row.narrative_id], row.answer, row.is_correct,
+         row.predicted if feedback_cache.CACHE_KEY == "labels" else None)
+        for row in _common_answers(top, min_count, segment)
+    ]
+    # The cache uses its own connections; don't sit on this one meanwhile
+    db.session.close()
+    if feedback_cache.CACHE_KEY == "labels":
+        # Correct answers usually name exactly the expected emotions
+        for narrative in narratives.values():
+            if segment and narrative.segment != segment:
+                continue
+            expected = [normalize_label(label) for label in narrative.emotion_labels]
+            jobs.append((narrative, f"Dia merasa {' dan '.join(narrative.emotion_labels)}", True, expected))
+
+    generated = cached = failed = 0
+    for narrative, answer, is_correct, predicted in jobs:
+        expected = [normalize_label(label) for label in narrative.emotion_labels]
+        if cached_feedback(narrative.content, answer, expected, is_correct, predicted) is not None:
+            cached += 1
+            continue
+        try:
+            generate_feedback(narrative.content, answer, expected, is_correct, predicted)
+            generated += 1
+        except Exception as e:
+            failed += 1
+            click.echo(f"{narrative.id}: {e}")
+    click.echo(f"Generated {generated}, already cached {cached}, failed {failed}")
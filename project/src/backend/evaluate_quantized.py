@@ -0,0 +1,107 @@
+import argparse
+import json
+import sys
+import time
+
+import inference
+from inference import EMOTION_LABELS
+
+# Compares the int8 model against the float model on a held-out set.
+#
+#   python evaluate_quantized.py heldout.jsonl --min-agreement 0.98
+#
+# Each line of the held-out file is {"text": "...", "labels": ["sad", ...]};
+# "labels" is optional and only used for the accuracy-vs-gold columns.
+
+
+def load_examples(path):
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                row = json.loads(line)
+                gold = set(l.lower() for l in row["labels"]) if "labels" in row else None
+                examples.append((row["text"], gold))
+    return examples
+
+
+def predict_all(tokenizer, model, texts, batch_size):
+    probs, started = [], time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        probs.extend(inference.run_model(tokenizer, model, texts[start:start + batch_size]))
+    return probs, time.perf_counter() - started
+
+
+def f1(tp, fp, fn):
+    return 2 * tp / (2 * tp + fp + fn) if tp else 0.0
+
+
+def compare(examples, float_probs, quant_probs, threshold):
+    report = {"per_label": {}}
+    exact = 0
+    max_diff = 0.0
+    for i, label in enumerate(EMOTION_LABELS):
+        agree = 0
+        counts = {"float": [0, 0, 0], "int8": [0, 0, 0]}  # tp, fp, fn
+        for (_, gold), fp_row, q_row in zip(examples, float_probs, quant_probs):
+            f_pos, q_pos = fp_row[i] > threshold, q_row[i] > threshold
+            agree += f_pos == q_pos
+            max_diff = max(max_diff, abs(fp_row[i] - q_row[i]))
+            if gold is not None:
+                for name, pos in (("float", f_pos), ("int8", q_pos)):
+                    if pos and label in gold:
+                        counts[name][0] += 1
+                    elif pos:
+                        counts[name][1] += 1
+                    elif label in gold:
+                        counts[name][2] += 1
+        report["per_label"][label] = {
+            "agreement": agree / len(examples),
+            "f1_float": f1(*counts["float"]),
+            "f1_int8": f1(*counts["int8"]),
+        }
+
+    for fp_row, q_row in zip(float_probs, quant_probs):
+        exact += all((f > threshold) == (q > threshold) for f, q in zip(fp_row, q_row))
+    report["exact_match_agreement"] = exact / len(examples)
+    report["max_abs_prob_diff"] = max_diff
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare int8 and float emotion models")
+    parser.add_argument("heldout", help="JSONL file with text/labels rows")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--min-agreement", type=float, default=None,
+                        help="exit non-zero if any label agrees less than this")
+    args = parser.parse_args()
+
+    examples = load_examples(args.heldout)
+    if not examples:
+        parser.error("held-out file is empty")
+    texts = [text for text, _ in examples]
+
+    tokenizer, float_model = inference.load_model()
+    _, quant_model = inference.load_model(quantize="int8")
+
+    float_probs, float_secs = predict_all(tokenizer, float_model, texts, args.batch_size)
+    quant_probs, quant_secs = predict_all(tokenizer, quant_model, texts, args.batch_size)
+
+    report = compare(examples, float_probs, quant_probs, args.threshold)
+    report["examples"] = len(examples)
+    report["float_seconds"] = float_secs
+    report["int8_seconds"] = quant_secs
+    report["speedup"] = float_secs / quant_secs if quant_secs else None
+    print(json.dumps(report, indent=2))
+
+    if args.min_agreement is not None:
+        worst = min(v["agreement"] for v in report["per_label"].values())
+        if worst < args.min_agreement:
+            print(f"Label agreement {worst:.3f} below {args.min_agreement}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
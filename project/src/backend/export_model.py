@@ -0,0 +1,97 @@
+import argparse
+import os
+
+from inference import MODEL_PATH
+from inference_backends import EXPORT_FILES, INPUT_NAMES, export_path, quantize_model
+
+# Exports emotion_model/ to a static graph for EMOTION_BACKEND=torchscript|onnx.
+#
+#   python export_model.py --format torchscript
+#   python export_model.py --format onnx
+
+
+def load_for_export():
+    import torch
+    from transformers import BertForSequenceClassification
+
+    # Plain attention keeps the traced graph free of sdpa-specific branches
+    model = BertForSequenceClassification.from_pretrained(MODEL_PATH, attn_implementation="eager")
+    model.eval()
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).logits
+
+    # trace copies the wrapper's training flag, and freeze needs eval mode
+    return LogitsOnly(model).eval()
+
+
+def example_inputs():
+    from transformers import BertTokenizer
+
+    tokenizer = BertTokenizer.from_pretrained(MODEL_PATH)
+    inputs = tokenizer(
+        ["aku sedih karena temanku pindah sekolah", "senang"],
+        return_tensors="pt", padding=True, truncation=True,
+    )
+    return tuple(inputs[name] for name in INPUT_NAMES)
+
+
+def export_torchscript(module, inputs, output, quantize=None):
+    import torch
+
+    if quantize:
+        module = quantize_model(module, quantize)
+    with torch.no_grad():
+        traced = torch.jit.trace(module, inputs, strict=False)
+    traced = torch.jit.freeze(traced.eval())
+    traced.save(output)
+
+
+def export_onnx(module, inputs, output):
+    import torch
+
+    torch.onnx.export(
+        module,
+        inputs,
+        output,
+        input_names=INPUT_NAMES,
+        output_names=["logits"],
+        dynamic_axes={
+            **{name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES},
+            "logits": {0: "batch"},
+        },
+        opset_version=14,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the emotion model to TorchScript or ONNX")
+    parser.add_argument("--format", choices=sorted(EXPORT_FILES), default="torchscript")
+    parser.add_argument("--output", help="defaults to emotion_model/exported/<file>")
+    parser.add_argument("--quantize", choices=["int8"], help="torchscript only")
+    args = parser.parse_args()
+
+    if args.quantize and args.format != "torchscript":
+        parser.error("--quantize is only supported with --format torchscript")
+
+    output = args.output or export_path(MODEL_PATH, args.format)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    module = load_for_export()
+    inputs = example_inputs()
+    if args.format == "torchscript":
+        export_torchscript(module, inputs, output, args.quantize)
+    else:
+        export_onnx(module, inputs, output)
+    print(f"Exported {args.format} model to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import db
+from models import FeedbackCacheEntry
+from prediction_cache import normalize_text
+
+# GPT feedback depends only on the prompt inputs, and many children give the
+# same answer to the same story. Entries are keyed on the normalized story,
+# expected emotions, correctness and an answer class, then kept in a per-process
+# LRU in front of the shared feedback_cache table (so `flask pregenerate-feedback`
+# warms every worker). The table is read and written on a connection of its
+# own, outside the caller's transaction, so call the cache while the session
+# isn't holding one; otherwise each request needs two pool slots at once.
+# Database errors only cost the table tier: a failed read is a miss and a
+# failed write is skipped, so feedback still works without the DB.
+# FEEDBACK_CACHE_KEY picks the answer class:
+#   answer - the normalized answer text (default)
+#   labels - the emotions the classifier predicted, when known; coarser, so
+#            more hits, but feedback no longer echoes the child's wording
+
+CACHE_KEY = os.getenv("FEEDBACK_CACHE_KEY", "answer")
+CACHE_SIZE = int(os.getenv("FEEDBACK_CACHE_SIZE", "5000"))
+CACHE_TTL_SECONDS = int(os.getenv("FEEDBACK_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_PERSIST = os.getenv("FEEDBACK_CACHE_PERSIST", "1").lower() in ("1", "true", "yes")
+CACHE_MAX_ROWS = int(os.getenv("FEEDBACK_CACHE_MAX_ROWS", "50000"))
+PRUNE_EVERY = 100  # puts between table prunes
+
+logger = logging.getLogger(__name__)
+
+
+def answer_class(answer, predicted_emotions=None):
+    if CACHE_KEY == "labels" and predicted_emotions is not None:
+        return "labels:" + ",".join(sorted({label.lower() for label in predicted_emotions}))
+    return "answer:" + normalize_text(answer)
+
+
+def cache_key(narrative_text, answer, expected_emotions, is_correct, predicted_emotions=None):
+    parts = [
+        normalize_text(narrative_text),
+        ",".join(sorted(label.lower() for label in expected_emotions or [])),
+        "1" if is_correct else "0",
+        answer_class(answer, predicted_emotions),
+    ]
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class FeedbackCache:
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL_SECONDS, persist=CACHE_PERSIST, max_rows=CACHE_MAX_ROWS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist = persist
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self._puts = 0
+        self._entries = OrderedDict()  # key -> (feedback, expiry as time.time())
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if self.max_size <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+
+        if self.persist:
+            try:
+                with db.engine.connect() as conn:
+                    row = conn.execute(
+                        select(FeedbackCacheEntry.feedback, FeedbackCacheEntry.expires_at)
+                        .where(FeedbackCacheEntry.key == key, FeedbackCacheEntry.expires_at > datetime.utcnow())
+                    ).first()
+            except SQLAlchemyError as e:
+                logger.warning("Feedback cache read failed: %s", e)
+                row = None
+            if row:
+                remaining = (row.expires_at - datetime.utcnow()).total_seconds()
+                self._store(key, row.feedback, now + remaining)
+                with self._lock:
+                    self.hits += 1
+                    self.persistent_hits += 1
+                return row.feedback
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, feedback):
+        if self.max_size <= 0 or not feedback:
+            return
+        self._store(key, feedback, time.time() + self.ttl)
+        if not self.persist:
+            return
+
+        now = datetime.utcnow()
+        stmt = insert(FeedbackCacheEntry).values(
+            key=key, feedback=feedback, created_at=now, expires_at=now + timedelta(seconds=self.ttl))
+        with self._lock:
+            self._puts += 1
+            prune = self._puts % PRUNE_EVERY == 0
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(stmt.on_conflict_do_update(
+                    index_elements=[FeedbackCacheEntry.key],
+                    set_={"feedback": stmt.excluded.feedback, "created_at": stmt.excluded.created_at,
+                          "expires_at": stmt.excluded.expires_at},
+                ))
+            if prune:
+                self.prune()
+        except SQLAlchemyError as e:
+            logger.warning("Feedback cache write failed: %s", e)
+
+    def prune(self):
+        """Drop expired rows and keep the newest max_rows; returns rows removed."""
+        with db.engine.begin() as conn:
+            removed = conn.execute(
+                delete(FeedbackCacheEntry).where(FeedbackCacheEntry.expires_at <= datetime.utcnow())
+            ).rowcount
+            keep = select(FeedbackCacheEntry.key).order_by(FeedbackCacheEntry.created_at.desc()).limit(self.max_rows)
+            removed += conn.execute(
+                delete(FeedbackCacheEntry).where(FeedbackCacheEntry.key.not_in(keep))
+            ).rowcount
+        return removed
+
+    def _store(self, key, feedback, expires_at):
+        with self._lock:
+            self._entries[key] = (feedback, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.persistent_hits = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "key": CACHE_KEY,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "persistent_hits": self.persistent_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "persistent": self.persist,
+            }
+
+
+cache = FeedbackCache()
@@ -0,0 +1,263 @@
+import itertools
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from db import db
+from models import FeedbackJob, Response
+import llm
+
+# GPT feedback runs in a small pool of background threads instead of inside
+# the request. Jobs carry generate_feedback()'s arguments plus the response
+# whose feedback column receives the result; clients poll GET
+# /feedback-jobs/<id>. FEEDBACK_QUEUE picks where jobs live:
+#   db     - feedback_jobs table, shared by every worker process and
+#            survives restarts (default)
+#   memory - in-process only, for a single process or offline runs
+
+QUEUE_BACKEND = os.getenv("FEEDBACK_QUEUE", "db")
+WORKERS = int(os.getenv("FEEDBACK_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("FEEDBACK_MAX_ATTEMPTS", "3"))
+POLL_SECONDS = float(os.getenv("FEEDBACK_POLL_SECONDS", "1"))
+# A running job not finished after this long is assumed lost and retried. It
+# has to outlast the LLM client's retries, or a slow job is claimed again
+# while it is still running; the default leaves a minute on top
+MIN_JOB_TIMEOUT_SECONDS = llm.worst_case_seconds()
+JOB_TIMEOUT_SECONDS = float(os.getenv("FEEDBACK_JOB_TIMEOUT", "0")) or MIN_JOB_TIMEOUT_SECONDS + 60
+
+logger = logging.getLogger(__name__)
+
+
+def write_feedback(response_id, feedback):
+    response = db.session.get(Response, response_id)
+    if response:
+        response.feedback = feedback
+
+
+class MemoryQueue:
+    def __init__(self):
+        self._jobs = {}
+        self._queued = deque()
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+
+    def enqueue(self, response_id, payload):
+        with self._cond:
+            job = {"id": next(self._ids), "response_id": response_id, "payload": payload,
+                   "status": "queued", "attempts": 0, "feedback": None, "error": None}
+            self._jobs[job["id"]] = job
+            self._queued.append(job["id"])
+            self._cond.notify()
+            return self._public(job)
+
+    def claim(self, timeout):
+        with self._cond:
+            if not self._queued:
+                self._cond.wait(timeout)
+            if not self._queued:
+                return None
+            job = self._jobs[self._queued.popleft()]
+            job["status"] = "running"
+            job["attempts"] += 1
+            return {"id": job["id"], "response_id": job["response_id"], "payload": job["payload"]}
+
+    def complete(self, job_id, feedback):
+        with self._cond:
+            job = self._jobs[job_id]
+        write_feedback(job["response_id"], feedback)
+        db.session.commit()
+        with self._cond:
+            job.update(status="done", feedback=feedback, error=None)
+
+    def fail(self, job_id, error):
+        with self._cond:
+            job = self._jobs[job_id]
+            job["error"] = error
+            if job["attempts"] < MAX_ATTEMPTS:
+                job["status"] = "queued"
+                self._queued.append(job_id)
+                self._cond.notify()
+            else:
+                job["status"] = "failed"
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def _public(self, job):
+        return {key: job[key] for key in ("id", "response_id", "status", "attempts", "feedback", "error")}
+
+
+class DatabaseQueue:
+    def __init__(self):
+        # Wakes local workers on enqueue; jobs from other processes are
+        # picked up on the next poll
+        self._wakeup = threading.Event()
+
+    def enqueue(self, response_id, payload):
+        job = FeedbackJob(response_id=response_id, payload=payload, status="queued")
+        db.session.add(job)
+        db.session.commit()
+        self._wakeup.set()
+        return self._public(job, None)
+
+    def claim(self, timeout):
+        job = self._claim_next()
+        if job is None:
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            job = self._claim_next()
+        return job
+
+    def _claim_next(self):
+        stale = datetime.utcnow() - timedelta(seconds=JOB_TIMEOUT_SECONDS)
+        while True:
+            job = (
+                db.session.query(FeedbackJob)
+                .filter(db.or_(
+                    FeedbackJob.status == "queued",
+                    db.and_(FeedbackJob.status == "running", FeedbackJob.updated_at < stale),
+                ))
+                .order_by(FeedbackJob.id)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if job is None:
+                db.session.rollback()
+                return None
+            if job.status == "queued" or job.attempts < MAX_ATTEMPTS:
+                break
+            # Lost on every attempt; don't let it hang workers forever
+            job.status = "failed"
+            job.error = f"Timed out after {job.attempts} attempt(s)"
+            job.updated_at = datetime.utcnow()
+            db.session.commit()
+        job.status = "running"
+        job.attempts += 1
+        job.updated_at = datetime.utcnow()
+        claimed = {"id": job.id, "response_id": job.response_id, "payload": job.payload}
+        db.session.commit()
+        return claimed
+
+    def complete(self, job_id, feedback):
+        job = db.session.get(FeedbackJob, job_id)
+        write_feedback(job.response_id, feedback)
+        job.status = "done"
+        job.error = None
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+
+    def fail(self, job_id, error):
+        job = db.session.get(FeedbackJob, job_id)
+        job.status = "queued" if job.attempts < MAX_ATTEMPTS else "failed"
+        job.error = error
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+
+    def get(self, job_id):
+        row = (
+            db.session.query(FeedbackJob, Response.feedback)
+            .outerjoin(Response, Response.id == FeedbackJob.response_id)
+            .filter(FeedbackJob.id == job_id)
+            .first()
+        )
+        return self._public(*row) if row else None
+
+    def _public(self, job, feedback):
+        return {
+            "id": job.id,
+            "response_id": job.response_id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "feedback": feedback if job.status == "done" else None,
+            "error": job.error,
+        }
+
+
+QUEUES = {
+    "db": DatabaseQueue,
+    "memory": MemoryQueue,
+}
+
+if JOB_TIMEOUT_SECONDS < MIN_JOB_TIMEOUT_SECONDS:
+    raise ValueError(f"FEEDBACK_JOB_TIMEOUT={JOB_TIMEOUT_SECONDS:g} is shorter than an LLM call can take "
+                     f"({MIN_JOB_TIMEOUT_SECONDS:g}s with the LLM_* settings)")
+if QUEUE_BACKEND not in QUEUES:
+    raise ValueError(f"Unknown FEEDBACK_QUEUE {QUEUE_BACKEND!r}; expected one of {sorted(QUEUES)}")
+queue = QUEUES[QUEUE_BACKEND]()
+
+
+def run_job(job):
+    # Imported here; routes.gpt_feedback imports this module
+    from routes.gpt_feedback import generate_feedback
+
+    try:
+        feedback = generate_feedback(**job["payload"])
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Feedback job %s failed: %s", job["id"], e)
+        queue.fail(job["id"], str(e))
+        return
+    queue.complete(job["id"], feedback)
+
+
+class WorkerPool:
+    def __init__(self, app, size=WORKERS):
+        self.app = app
+        self.size = size
+        self.threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        for i in range(self.size):
+            thread = threading.Thread(target=self._run, name=f"feedback-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    job = queue.claim(POLL_SECONDS)
+                    if job:
+                        run_job(job)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Feedback worker error")
+                    self._stop.wait(POLL_SECONDS)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start_workers(app, size=WORKERS):
+    """Start this process's worker pool once; later calls are no-ops."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool(app, size)
+            _pool.start()
+    return _pool
+
+
+def enqueue_feedback(app, response_id, narrative_text, answer, expected_emotions, is_correct,
+                     predicted_emotions=None):
+    start_workers(app)
+    return queue.enqueue(response_id, {
+        "narrative_text": narrative_text,
+        "answer": answer,
+        "expected_emotions": expected_emotions,
+        "is_correct": is_correct,
+        "predicted_emotions": predicted_emotions,
+    })
+
+
+def get_job(job_id):
+    return queue.get(job_id)
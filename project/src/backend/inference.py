@@ -0,0 +1,193 @@
+from batching import MicroBatcher
+from prediction_cache import PredictionCache, model_fingerprint
+from inference_backends import load_backend, artifact_version, default_thread_budget
+from inference_metrics import SequenceMetrics
+from tokenization import load_encoder, MAX_POSITIONS
+import threading
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "emotion_model"))
+
+BATCH_MAX_SIZE = int(os.getenv("EMOTION_BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("EMOTION_BATCH_MAX_WAIT_MS", "5"))
+PREDICT_TIMEOUT = float(os.getenv("EMOTION_PREDICT_TIMEOUT", "30"))
+BUCKET_SIZE = int(os.getenv("EMOTION_BUCKET_SIZE", "16"))
+CACHE_SIZE = int(os.getenv("EMOTION_CACHE_SIZE", "10000"))
+CACHE_PATH = os.getenv("EMOTION_CACHE_PATH")  # optional sqlite file shared across restarts
+CACHE_MAX_ROWS = int(os.getenv("EMOTION_CACHE_MAX_ROWS", "100000"))
+# When set, predictions are served by inference_server.py instead of in-process
+INFERENCE_SOCKET = os.getenv("EMOTION_INFERENCE_SOCKET")
+# "int8" swaps the Linear layers for dynamically quantized ones (CPU only)
+QUANTIZE = os.getenv("EMOTION_QUANTIZE", "").lower() or None
+# "eager" (transformers), or "torchscript"/"onnx" after running export_model.py
+BACKEND = os.getenv("EMOTION_BACKEND", "eager").lower()
+FAST_TOKENIZER = os.getenv("EMOTION_FAST_TOKENIZER", "1").lower() not in ("0", "false", "no")
+TOKEN_CACHE_SIZE = int(os.getenv("EMOTION_TOKEN_CACHE_SIZE", "20000"))
+# Answers are a sentence or two; anything longer is cut so a pasted essay
+# can't turn one request into a 512-token forward pass
+MAX_LENGTH = min(int(os.getenv("EMOTION_MAX_LENGTH", "128")), MAX_POSITIONS)
+# Intra-op threads per process; defaults to cpu_count / WEB_CONCURRENCY
+TORCH_THREADS = int(os.getenv("EMOTION_TORCH_THREADS", "0")) or default_thread_budget()
+
+# Output order of the classifier head, same as the frontend's emotionLabels
+EMOTION_LABELS = ["happy", "sad", "angry", "envy", "embarrassed", "fear"]
+
+cache = PredictionCache(
+    model_fingerprint(MODEL_PATH, f"{artifact_version(MODEL_PATH, BACKEND)}/{QUANTIZE or 'fp32'}"),
+    max_size=CACHE_SIZE, persist_path=CACHE_PATH, max_rows=CACHE_MAX_ROWS)
+metrics = SequenceMetrics()
+
+# torch/transformers are only imported and the weights only loaded on first
+# use, so workers that never serve /predict don't pay for them
+_tokenizer = None
+_model = None
+_load_lock = threading.Lock()
+_load_error = None
+_load_seconds = None
+
+
+def load_model(quantize=None, backend="eager", fast_tokenizer=FAST_TOKENIZER, threads=None):
+    tokenizer = load_encoder(MODEL_PATH, fast=fast_tokenizer, cache_size=TOKEN_CACHE_SIZE, max_length=MAX_LENGTH)
+    return tokenizer, load_backend(backend, MODEL_PATH, quantize=quantize, threads=threads)
+
+
+def get_model():
+    global _tokenizer, _model, _load_error, _load_seconds
+    if _model is not None:
+        return _tokenizer, _model
+    with _load_lock:
+        if _model is None:
+            started = time.monotonic()
+            try:
+                tokenizer, model = load_model(QUANTIZE, BACKEND, threads=TORCH_THREADS)
+            except Exception as e:
+                _load_error = str(e)
+                raise
+            _tokenizer, _model = tokenizer, model
+            _load_error = None
+            _load_seconds = time.monotonic() - started
+            logger.info("Emotion model loaded in %.1fs (backend=%s, quantize=%s, threads=%d)",
+                        _load_seconds, BACKEND, QUANTIZE, TORCH_THREADS)
+    return _tokenizer, _model
+
+
+_remote = None
+
+
+def remote_client():
+    global _remote
+    if _remote is None:
+        from inference_client import InferenceClient
+        _remote = InferenceClient(INFERENCE_SOCKET, timeout=PREDICT_TIMEOUT)
+    return _remote
+
+
+def local_status():
+    return {
+        "ready": _model is not None,
+        "error": _load_error,
+        "load_seconds": _load_seconds,
+        "backend": BACKEND,
+        "quantize": QUANTIZE,
+        "threads": TORCH_THREADS,
+        "max_length": MAX_LENGTH,
+        "token_cache": _tokenizer.cache_info() if _tokenizer else None,
+    }
+
+
+def status():
+    if not INFERENCE_SOCKET:
+        return local_status()
+    try:
+        return {**remote_client().status(), "remote": INFERENCE_SOCKET}
+    except Exception as e:
+        return {"ready": False, "error": str(e), "remote": INFERENCE_SOCKET}
+
+
+def warm_up(background=True):
+    if INFERENCE_SOCKET:
+        return None
+
+    def load():
+        try:
+            get_model()
+        except Exception:
+            logger.exception("Emotion model warm-up failed")
+
+    if not background:
+        load()
+        return None
+    thread = threading.Thread(target=load, name="emotion-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def run_model(tokenizer, model, texts):
+    texts = list(texts)
+    metrics.record_batch(
+        [len(tokenizer.encode(text)) for text in texts],
+        [tokenizer.raw_length(text) for text in texts],
+    )
+    # One padded forward pass for the whole list, one probability row per text
+    inputs = tokenizer.batch(texts, model.tensor_type)
+    return model.predict(inputs)
+
+
+def sequence_length(text):
+    # Token count the model sees for `text`, or None if it isn't loaded here
+    if _tokenizer is None:
+        return None
+    return len(_tokenizer.encode(text))
+
+
+def predict_batch(texts):
+    tokenizer, model = get_model()
+    return run_model(tokenizer, model, texts)
+
+
+batcher = MicroBatcher(predict_batch, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+
+
+def predict_text(text):
+    if INFERENCE_SOCKET:
+        return remote_client().predict([text])[0]
+    return predict_text_local(text)
+
+
+def predict_bucketed(texts, bucket_size=BUCKET_SIZE):
+    if INFERENCE_SOCKET:
+        return remote_client().predict(texts)
+    return predict_bucketed_local(texts, bucket_size)
+
+
+def predict_text_local(text):
+    probs = cache.get(text)
+    if probs is None:
+        probs = batcher.predict(text, timeout=PREDICT_TIMEOUT)
+        cache.put(text, probs)
+    return probs
+
+
+def predict_bucketed_local(texts, bucket_size=BUCKET_SIZE):
+    # Sort by token length and run similar-length texts together so short
+    # answers are not padded up to the longest one in the request
+    texts = list(texts)
+    results = [cache.get(text) for text in texts]
+    pending = [i for i, probs in enumerate(results) if probs is None]
+    if not pending:
+        return results
+
+    # Encodings are cached, so measuring lengths here is free for the forward pass
+    tokenizer, _ = get_model()
+    order = sorted(pending, key=lambda i: len(tokenizer.encode(texts[i])))
+
+    for start in range(0, len(order), bucket_size):
+        bucket = order[start:start + bucket_size]
+        for i, probs in zip(bucket, predict_batch([texts[i] for i in bucket])):
+            results[i] = probs
+            cache.put(texts[i], probs)
+    return results
@@ -0,0 +1,134 @@
+import os
+
+# Runtimes that can execute the emotion classifier. Each backend takes the
+# tokenizer output (as torch or numpy tensors, see `tensor_type`) and returns
+# one list of sigmoid probabilities per input row.
+
+EXPORT_DIR = "exported"
+EXPORT_FILES = {
+    "torchscript": "model.torchscript.pt",
+    "onnx": "model.onnx",
+}
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+def export_path(model_path, backend):
+    return os.path.join(model_path, EXPORT_DIR, EXPORT_FILES[backend])
+
+
+def default_thread_budget():
+    # Split the cores between web workers instead of letting every worker's
+    # intra-op pool claim all of them (gunicorn reads WEB_CONCURRENCY too)
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def set_torch_threads(threads):
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before the first parallel op; keep whatever is set
+        pass
+
+
+class EagerBackend:
+    name = "eager"
+    tensor_type = "pt"
+
+    def __init__(self, model_path, quantize=None, threads=None):
+        from transformers import BertForSequenceClassification
+
+        if threads:
+            set_torch_threads(threads)
+        self.model = BertForSequenceClassification.from_pretrained(model_path)
+        self.model.eval()
+        if quantize:
+            self.model = quantize_model(self.model, quantize)
+
+    def predict(self, inputs):
+        import torch
+
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        return torch.sigmoid(logits).tolist()
+
+
+class TorchScriptBackend:
+    name = "torchscript"
+    tensor_type = "pt"
+
+    def __init__(self, model_path, quantize=None, threads=None):
+        import torch
+
+        if threads:
+            set_torch_threads(threads)
+        if quantize:
+            raise ValueError("Quantize the model at export time (export_model.py --quantize int8)")
+        self.module = torch.jit.load(export_path(model_path, self.name))
+        self.module.eval()
+
+    def predict(self, inputs):
+        import torch
+
+        with torch.no_grad():
+            logits = self.module(*(inputs[name] for name in INPUT_NAMES))
+        return torch.sigmoid(logits).tolist()
+
+
+class OnnxBackend:
+    name = "onnx"
+    tensor_type = "np"
+
+    def __init__(self, model_path, quantize=None, threads=None):
+        import onnxruntime
+
+        if quantize:
+            raise ValueError("Quantization is not supported for the onnx backend")
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            export_path(model_path, self.name), options, providers=["CPUExecutionProvider"]
+        )
+
+    def predict(self, inputs):
+        import numpy as np
+
+        feed = {name: inputs[name].astype(np.int64) for name in INPUT_NAMES}
+        (logits,) = self.session.run(["logits"], feed)
+        return (1 / (1 + np.exp(-logits))).tolist()
+
+
+BACKENDS = {
+    EagerBackend.name: EagerBackend,
+    TorchScriptBackend.name: TorchScriptBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def quantize_model(model, mode="int8"):
+    import torch
+
+    if mode != "int8":
+        raise ValueError(f"Unsupported quantization mode: {mode}")
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_backend(name, model_path, quantize=None, threads=None):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown emotion backend {name!r} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](model_path, quantize=quantize, threads=threads)
+
+
+def artifact_version(model_path, name):
+    # Exported graphs can be regenerated without touching the source weights
+    if name == EagerBackend.name:
+        return name
+    path = export_path(model_path, name)
+    if not os.path.exists(path):
+        return name
+    return f"{name}:{os.stat(path).st_mtime_ns}"
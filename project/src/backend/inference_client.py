@@ -0,0 +1,56 @@
+import json
+import socket
+import struct
+
+# Messages are a 4-byte big-endian length followed by a UTF-8 JSON body
+
+
+def parse_address(address):
+    # "/path/to.sock" -> unix socket, "host:port" -> TCP
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+def send_message(sock, payload):
+    body = json.dumps(payload).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(body)) + body)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Inference connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    (size,) = struct.unpack(">I", _recv_exact(sock, 4))
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+
+class InferenceClient:
+    def __init__(self, address, timeout=30):
+        self.family, self.address = parse_address(address)
+        self.timeout = timeout
+
+    def _call(self, payload):
+        with socket.socket(self.family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+            send_message(sock, payload)
+            reply = recv_message(sock)
+        if reply.get("error"):
+            raise RuntimeError(f"Inference server error: {reply['error']}")
+        return reply
+
+    def predict(self, texts):
+        return self._call({"op": "predict", "texts": list(texts)})["probabilities"]
+
+    def status(self):
+        return self._call({"op": "status"})
@@ -0,0 +1,56 @@
+import resource
+import threading
+
+# Token-length statistics for the batches the model actually runs, so long
+# pasted answers and padding waste show up before they show up as tail latency.
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class SequenceMetrics:
+    BUCKETS = (8, 16, 32, 64, 128, 256, 512)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.sequences = 0
+        self.batches = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+        self.truncated = 0
+        self.longest = 0
+        self.histogram = {bound: 0 for bound in self.BUCKETS}
+
+    def record_batch(self, lengths, raw_lengths):
+        if not lengths:
+            return
+        width = max(lengths)
+        with self._lock:
+            self.batches += 1
+            self.sequences += len(lengths)
+            self.tokens += sum(lengths)
+            self.padded_tokens += width * len(lengths)
+            self.longest = max(self.longest, max(raw_lengths))
+            self.truncated += sum(raw > used for raw, used in zip(raw_lengths, lengths))
+            for length in lengths:
+                for bound in self.BUCKETS:
+                    if length <= bound:
+                        self.histogram[bound] += 1
+                        break
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "sequences": self.sequences,
+                "batches": self.batches,
+                "mean_length": self.tokens / self.sequences if self.sequences else 0.0,
+                "longest_input": self.longest,
+                "truncated": self.truncated,
+                "padding_efficiency": self.tokens / self.padded_tokens if self.padded_tokens else 1.0,
+                "histogram": {f"<={bound}": count for bound, count in self.histogram.items()},
+            }
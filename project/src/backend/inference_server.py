@@ -0,0 +1,111 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+
+import inference
+from inference_client import parse_address, send_message, recv_message
+
+# Standalone process that owns the emotion model. Flask workers started with
+# EMOTION_INFERENCE_SOCKET pointing here forward /predict calls over the socket
+# instead of loading their own copy of the weights.
+#
+#   python inference_server.py --address /tmp/feelio-inference.sock --processes 2
+#
+# With --processes > 1 the weights are loaded once and the process forks;
+# children share the read-only weight pages copy-on-write, so memory stays
+# roughly flat as inference processes are added.
+
+logger = logging.getLogger("inference_server")
+
+
+def handle(conn):
+    with conn:
+        try:
+            request = recv_message(conn)
+            op = request.get("op")
+            if op == "predict":
+                texts = request.get("texts") or []
+                if len(texts) == 1:
+                    # Single answers from concurrent web workers share forward passes
+                    probs = [inference.predict_text_local(texts[0])]
+                else:
+                    probs = inference.predict_bucketed_local(texts)
+                send_message(conn, {"probabilities": probs})
+            elif op == "status":
+                send_message(conn, {
+                    **inference.local_status(),
+                    "pid": os.getpid(),
+                    "cache": inference.cache.stats(),
+                    "sequences": inference.metrics.snapshot(),
+                })
+            else:
+                send_message(conn, {"error": f"Unknown op {op!r}"})
+        except Exception as e:
+            logger.exception("Inference request failed")
+            try:
+                send_message(conn, {"error": str(e)})
+            except OSError:
+                pass
+
+
+def serve(listener):
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+def bind(address):
+    family, addr = parse_address(address)
+    if family == socket.AF_UNIX and os.path.exists(addr):
+        os.unlink(addr)
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    if family != socket.AF_UNIX:
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(addr)
+    listener.listen(128)
+    return listener
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the emotion model over a local socket")
+    parser.add_argument("--address", default=os.getenv("EMOTION_INFERENCE_SOCKET", "/tmp/feelio-inference.sock"))
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=None,
+                        help="torch threads per inference process (default: cpu_count / processes)")
+    args = parser.parse_args()
+
+    inference.TORCH_THREADS = args.threads or max(1, (os.cpu_count() or 1) // max(1, args.processes))
+
+    logging.basicConfig(level=logging.INFO)
+
+    # Load before forking so every child maps the same weight pages
+    inference.get_model()
+    listener = bind(args.address)
+    logger.info("Listening on %s", args.address)
+
+    children = []
+    for _ in range(max(0, args.processes - 1)):
+        pid = os.fork()
+        if pid == 0:
+            serve(listener)
+            os._exit(0)
+        children.append(pid)
+
+    def shutdown(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    serve(listener)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+from collections import deque
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+# Chat-completion clients. LLM_CLIENT=fake swaps in FakeLLMClient so feedback
+# can be exercised offline (tests, demos, load runs) without an API key;
+# OPENAI_BASE_URL points the real client at another server, e.g.
+# mock_llm_server.py. Either way calls go through ResilientClient, which caps
+# concurrency, paces requests to our quota and retries transient failures.
+
+LLM_CLIENT = os.getenv("LLM_CLIENT", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+# Token bucket sized to the account's request quota; 0 disables it. The bucket
+# lives in each process, so the quota and burst are split across
+# LLM_PROCESSES: the web workers (WEB_CONCURRENCY, as gunicorn reads it) plus
+# any separate `flask feedback-worker`s, which need it set explicitly
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+LLM_PROCESSES = max(1, int(os.getenv("LLM_PROCESSES") or os.getenv("WEB_CONCURRENCY") or "1"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+# How long a call may wait for a slot or a token before giving up
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+
+
+class LLMError(Exception):
+    def __init__(self, message, retryable=False, retry_after=None, kind="error"):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.kind = kind  # metrics bucket: "429", "5xx", "timeout", "busy", ...
+
+
+class OpenAIClient:
+    """Chat completions over one pooled, keep-alive HTTP client."""
+
+    def __init__(self, model=LLM_MODEL, base_url=OPENAI_BASE_URL, api_key=None):
+        import httpx
+
+        self.model = model
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.http = httpx.Client(
+            base_url=base_url.rstrip("/"),
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE),
+        )
+
+    def _body(self, messages, temperature, max_tokens, stream=False):
+        body = {"model": self.model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+        if stream:
+            body["stream"] = True
+        return body
+
+    def _check(self, response):
+        status = response.status_code
+        if status < 400:
+            return
+        retry_after = response.headers.get("retry-after")
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        if status == 429:
+            raise LLMError("LLM rate limited (HTTP 429)", retryable=True, retry_after=retry_after, kind="429")
+        if status >= 500:
+            raise LLMError(f"LLM server error (HTTP {status})", retryable=True, retry_after=retry_after, kind="5xx")
+        raise LLMError(f"LLM request rejected (HTTP {status}): {response.text[:200]}", kind="4xx")
+
+    @contextmanager
+    def _transport_errors(self):
+        import httpx
+
+        try:
+            yield
+        except httpx.TimeoutException as e:
+            raise LLMError(f"LLM request timed out: {e}", retryable=True, kind="timeout") from e
+        except (httpx.NetworkError, httpx.RemoteProtocolError) as e:
+            raise LLMError(f"LLM connection failed: {e}", retryable=True, kind="connection") from e
+        except httpx.TransportError as e:
+            raise LLMError(f"LLM request failed: {e}", kind="transport") from e
+
+    def complete(self, messages, temperature=0.7, max_tokens=200):
+        with self._transport_errors():
+            response = self.http.post("/chat/completions", json=self._body(messages, temperature, max_tokens))
+        self._check(response)
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+    def stream(self, messages, temperature=0.7, max_tokens=200):
+        with self._transport_errors():
+            with self.http.stream("POST", "/chat/completions",
+                                  json=self._body(messages, temperature, max_tokens, stream=True)) as response:
+                if response.status_code >= 400:
+                    response.read()
+                    self._check(response)
+                for line in response.iter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        return
+                    choices = json.loads(data).get("choices")
+                    text = choices[0].get("delta", {}).get("content") if choices else None
+                    if text:
+                        yield text
+
+
+FAKE_REPLIES = [
+    "Terima kasih sudah bercerita! Kamu sudah berusaha mengenali perasaan tokohnya dengan baik.",
+    "Jawabanmu menarik! Coba bayangkan bagaimana perasaanmu jika berada di posisi tokoh itu.",
+    "Bagus sekali sudah mencoba! Perasaan itu wajar, dan kita bisa menceritakannya kepada orang dewasa yang kita percaya.",
+]
+
+
+class FakeLLMClient:
+    """Deterministic stand-in: same prompt, same reply, after an optional delay.
+
+    stream() yields the reply word by word, token_delay apart. rate_limited
+    makes the first N calls fail with a retryable 429.
+    """
+
+    def __init__(self, delay=None, fail=False, token_delay=None, rate_limited=0):
+        self.delay = float(os.getenv("FAKE_LLM_DELAY_SECONDS", "0")) if delay is None else delay
+        self.token_delay = (float(os.getenv("FAKE_LLM_TOKEN_DELAY_SECONDS", "0"))
+                            if token_delay is None else token_delay)
+        self.fail = fail
+        self.rate_limited = rate_limited
+        self.calls = 0
+
+    def _start(self):
+        self.calls += 1
+        if self.calls <= self.rate_limited:
+            raise LLMError("fake LLM rate limit", retryable=True, kind="429")
+        if self.fail:
+            raise RuntimeError("fake LLM failure")
+
+    def complete(self, messages, temperature=0.7, max_tokens=200):
+        self._start()
+        if self.delay:
+            time.sleep(self.delay)
+        return self._reply(messages)
+
+    def stream(self, messages, temperature=0.7, max_tokens=200):
+        self._start()
+        words = self._reply(messages).split(" ")
+        for i, word in enumerate(words):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
+
+    def _reply(self, messages):
+        digest = hashlib.sha256(messages[-1]["content"].encode()).digest()
+        return FAKE_REPLIES[digest[0] % len(FAKE_REPLIES)]
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """Take one token, sleeping until one is free; returns seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return now - start
+                wait = (1 - self.tokens) / self.rate
+            if now + wait - start > timeout:
+                raise LLMError("LLM request quota exhausted", retryable=True, retry_after=wait, kind="busy")
+            time.sleep(wait)
+
+
+class LLMMetrics:
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.errors = {}
+        self.throttle_seconds = 0.0
+        self.latencies = deque(maxlen=window)  # per successful call, seconds
+        self.first_token = deque(maxlen=window)  # streams only
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def error(self, kind):
+        with self._lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def observe(self, series, seconds):
+        with self._lock:
+            getattr(self, series).append(seconds)
+
+    def snapshot(self):
+        def percentiles(values):
+            values = sorted(values)
+            if not values:
+                return {}
+            pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+            return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "retries": self.retries,
+                "in_flight": self.in_flight,
+                "errors": dict(self.errors),
+                "throttle_seconds": round(self.throttle_seconds, 3),
+                "latency": percentiles(self.latencies),
+                "first_token": percentiles(self.first_token),
+            }
+
+
+class ResilientClient:
+    """Wraps a client with an in-flight cap, a token bucket and jittered retries."""
+
+    def __init__(self, backend, max_in_flight=LLM_MAX_IN_FLIGHT, limiter=None,
+                 max_retries=LLM_MAX_RETRIES, queue_timeout=LLM_QUEUE_TIMEOUT):
+        self.backend = backend
+        self.max_in_flight = max_in_flight
+        self.limiter = limiter if limiter is not None else TokenBucket(
+            LLM_REQUESTS_PER_MINUTE / LLM_PROCESSES, LLM_BURST // LLM_PROCESSES)
+        self.max_retries = max_retries
+        self.queue_timeout = queue_timeout
+        self.metrics = LLMMetrics()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    @contextmanager
+    def _slot(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.metrics.error("busy")
+            raise LLMError("Too many LLM requests in flight", retryable=True, kind="busy")
+        self.metrics.add(in_flight=1)
+        try:
+            yield
+        finally:
+            self.metrics.add(in_flight=-1)
+            self._slots.release()
+
+    def _throttle(self):
+        self.metrics.add(calls=1, throttle_seconds=self.limiter.acquire(self.queue_timeout))
+
+    def _retry_or_raise(self, error, attempt):
+        kind = getattr(error, "kind", type(error).__name__)
+        self.metrics.error(kind)
+        if not getattr(error, "retryable", False) or attempt >= self.max_retries:
+            self.metrics.add(failed=1)
+            raise error
+        # Full jitter, but never sooner than the server asked for
+        delay = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+        if getattr(error, "retry_after", None):
+            delay = max(delay, min(error.retry_after, LLM_RETRY_MAX_SECONDS))
+        self.metrics.add(retries=1)
+        time.sleep(delay)
+
+    def complete(self, messages, temperature=0.7, max_tokens=200):
+        with self._slot():
+            for attempt in range(self.max_retries + 1):
+                self._throttle()
+                start = time.monotonic()
+                try:
+                    result = self.backend.complete(messages, temperature=temperature, max_tokens=max_tokens)
+                except Exception as e:
+                    self._retry_or_raise(e, attempt)
+                    continue
+                self.metrics.add(succeeded=1)
+                self.metrics.observe("latencies", time.monotonic() - start)
+                return result
+
+    def stream(self, messages, temperature=0.7, max_tokens=200):
+        with self._slot():
+            for attempt in range(self.max_retries + 1):
+                self._throttle()
+                start = time.monotonic()
+                started = False
+                try:
+                    for text in self.backend.stream(messages, temperature=temperature, max_tokens=max_tokens):
+                        if not started:
+                            started = True
+                            self.metrics.observe("first_token", time.monotonic() - start)
+                        yield text
+                except Exception as e:
+                    # Text already sent to the client can't be taken back
+                    if started:
+                        self.metrics.error(getattr(e, "kind", type(e).__name__))
+                        self.metrics.add(failed=1)
+                        raise
+                    self._retry_or_raise(e, attempt)
+                    continue
+                self.metrics.add(succeeded=1)
+                self.metrics.observe("latencies", time.monotonic() - start)
+                return
+
+
+def worst_case_seconds():
+    # Longest a ResilientClient call can take with the current settings: a
+    # wait for a slot, then per attempt a wait for a token plus the request,
+    # with the longest backoff between attempts
+    attempts = LLM_MAX_RETRIES + 1
+    return (LLM_QUEUE_TIMEOUT + attempts * (LLM_QUEUE_TIMEOUT + LLM_CONNECT_TIMEOUT + LLM_TIMEOUT)
+            + LLM_MAX_RETRIES * LLM_RETRY_MAX_SECONDS)
+
+
+CLIENTS = {
+    "openai": OpenAIClient,
+    "fake": FakeLLMClient,
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if LLM_CLIENT not in CLIENTS:
+                    raise ValueError(f"Unknown LLM_CLIENT {LLM_CLIENT!r}; expected one of {sorted(CLIENTS)}")
+                _client = ResilientClient(CLIENTS[LLM_CLIENT]())
+    return _client
+
+
+def set_client(client):
+    global _client
+    _client = client if isinstance(client, ResilientClient) else ResilientClient(client)
@@ -0,0 +1,43 @@
+import os
+from sqlalchemy import text
+
+from db import db
+
+# Plain SQL migrations: migrations/NNNN_name.sql, applied in file-name order
+# and recorded in schema_migrations. Each file runs in its own transaction.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+
+def available_migrations():
+    return sorted(name[:-4] for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+
+
+def applied_migrations(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version VARCHAR(100) PRIMARY KEY,"
+        " applied_at TIMESTAMP NOT NULL DEFAULT now())"
+    ))
+    return {version for (version,) in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending_migrations():
+    with db.engine.begin() as conn:
+        applied = applied_migrations(conn)
+    return [version for version in available_migrations() if version not in applied]
+
+
+def apply_migrations():
+    # New databases get their tables from the models first; migrations then
+    # only have to handle what create_all won't change on existing tables
+    db.create_all()
+    done = []
+    for version in pending_migrations():
+        with open(os.path.join(MIGRATIONS_DIR, version + ".sql")) as f:
+            sql = f.read()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(sql)
+            conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version})
+        done.append(version)
+    return done
@@ -0,0 +1,28 @@
+-- Indexes for the per-user response queries (history, stats, already-correct
+-- checks), cross-user emotion containment, mentor -> kid lookups and badges.
+
+CREATE INDEX IF NOT EXISTS ix_responses_user_narrative_correct
+    ON responses (user_id, narrative_id, is_correct);
+
+CREATE INDEX IF NOT EXISTS ix_responses_user_created
+    ON responses (user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS ix_responses_predicted_emotion
+    ON responses USING gin (predicted_emotion);
+
+CREATE INDEX IF NOT EXISTS ix_users_parent_id
+    ON users (parent_id);
+
+-- Drop duplicate awards before enforcing one row per (user, badge); run
+-- `flask reconcile-scores --fix` afterwards if any were removed
+DELETE FROM user_badges a
+    USING user_badges b
+    WHERE a.user_id = b.user_id AND a.badge_id = b.badge_id AND a.id > b.id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_user_badges_user_badge') THEN
+        ALTER TABLE user_badges
+            ADD CONSTRAINT uq_user_badges_user_badge UNIQUE (user_id, badge_id);
+    END IF;
+END $$;
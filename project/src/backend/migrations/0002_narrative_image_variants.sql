@@ -0,0 +1,3 @@
+-- Resized WebP variants of the narrative image, built by `flask build-images`
+
+ALTER TABLE narratives ADD COLUMN IF NOT EXISTS image_variants JSONB;
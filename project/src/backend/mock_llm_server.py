@@ -0,0 +1,105 @@
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm import FAKE_REPLIES
+
+# Local stand-in for the OpenAI chat completions API, for exercising the real
+# HTTP client (pooling, timeouts, retries, rate limiting) without a key:
+#
+#   python mock_llm_server.py --port 8089 --latency 0.5 --rate-limit-every 5
+#   OPENAI_BASE_URL=http://127.0.0.1:8089/v1 flask --app app run
+#
+# Supports plain and streamed ("stream": true) completions.
+
+
+def make_handler(args):
+    counter = itertools.count(1)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def log_message(self, fmt, *a):
+            if args.verbose:
+                super().log_message(fmt, *a)
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path.rstrip("/") != "/v1/chat/completions":
+                return self.send_json(404, {"error": {"message": "not found"}})
+
+            with lock:
+                n = next(counter)
+            if args.rate_limit_every and n % args.rate_limit_every == 0:
+                return self.send_json(429, {"error": {"message": "rate limited"}},
+                                      {"Retry-After": str(args.retry_after)})
+            if args.error_every and n % args.error_every == 0:
+                return self.send_json(500, {"error": {"message": "server error"}})
+
+            time.sleep(args.latency)
+            reply = FAKE_REPLIES[n % len(FAKE_REPLIES)]
+            if not body.get("stream"):
+                return self.send_json(200, {
+                    "id": f"mock-{n}",
+                    "object": "chat.completion",
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                                 "finish_reason": "stop"}],
+                })
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send_chunk(data):
+                payload = f"data: {data}\n\n".encode()
+                self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+                self.wfile.flush()
+
+            for i, word in enumerate(reply.split(" ")):
+                send_chunk(json.dumps({"id": f"mock-{n}", "object": "chat.completion.chunk",
+                                       "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}))
+                time.sleep(args.token_delay)
+            send_chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.03, help="seconds between streamed words")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with 429")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After sent with 429s")
+    parser.add_argument("--error-every", type=int, default=0, help="answer every Nth request with 500")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f"Mock LLM listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from db import db
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -14,6 +15,12 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     total_score = db.Column(db.Integer, default=0)  
 
+    # Indexes are created by migrations/ (see migrate.py); declared here too so
+    # create_all builds the same schema
+    __table_args__ = (
+        db.Index('ix_users_parent_id', 'parent_id'),
+    )
+
 class Narrative(db.Model):
     __tablename__ = 'narratives'
 
@@ -21,6 +28,7 @@ class Narrative(db.Model):
     title = db.Column(db.Text, nullable=False)                   # text
     content = db.Column(db.Text, nullable=False)                 # text
     image_path = db.Column(db.Text, nullable=True)               # text
+    image_variants = db.Column(JSONB, nullable=True)             # see assets.py
     emotion_labels = db.Column(db.ARRAY(db.Text), nullable=False)  # text[]
     segment = db.Column(db.Integer, nullable=False)              # integer
 
@@ -42,6 +50,12 @@ class Response(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     flagged = db.Column(db.Boolean, default=False)
 
+    __table_args__ = (
+        db.Index('ix_responses_user_narrative_correct', 'user_id', 'narrative_id', 'is_correct'),
+        db.Index('ix_responses_user_created', 'user_id', created_at.desc(), id.desc()),
+        db.Index('ix_responses_predicted_emotion', 'predicted_emotion', postgresql_using='gin'),
+    )
+
 
 class Badge(db.Model):
     __tablename__ = 'badges'
@@ -56,3 +70,66 @@ class UserBadge(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     badge_id = db.Column(db.Integer, db.ForeignKey('badges.id'), nullable=False)
     date_earned = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'badge_id', name='uq_user_badges_user_badge'),
+    )
+
+class ScoreLedgerEntry(db.Model):
+    __tablename__ = 'score_ledger'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(30), nullable=False)  # "response", "override", "badge", "reconcile"
+    response_id = db.Column(db.Integer, db.ForeignKey('responses.id'), nullable=True)
+    badge_id = db.Column(db.Integer, db.ForeignKey('badges.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class BadgeRule(db.Model):
+    __tablename__ = 'badge_rules'
+    badge_id = db.Column(db.Integer, db.ForeignKey('badges.id'), primary_key=True)
+    metric = db.Column(db.String(30), nullable=False)  # see badges.METRICS
+    threshold = db.Column(db.Integer, nullable=True)
+    emotion = db.Column(db.String(30), nullable=True)  # only for metric "emotion"
+
+class UserProgress(db.Model):
+    __tablename__ = 'user_progress'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    correct_score = db.Column(db.Integer, nullable=False, default=0)
+
+class UserEmotionStat(db.Model):
+    __tablename__ = 'user_emotion_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    emotion = db.Column(db.String(30), primary_key=True)  # lower-cased predicted label
+    attempted = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+
+class CatalogVersion(db.Model):
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)  # single row, id 1
+    version = db.Column(db.Integer, nullable=False, default=1)
+    published_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class FeedbackJob(db.Model):
+    __tablename__ = 'feedback_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('responses.id'), nullable=False)
+    payload = db.Column(JSONB, nullable=False)  # generate_feedback() arguments
+    status = db.Column(db.String(10), nullable=False, default="queued")  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_feedback_jobs_status', 'status', 'id'),
+    )
+
+class FeedbackCacheEntry(db.Model):
+    __tablename__ = 'feedback_cache'
+    key = db.Column(db.String(64), primary_key=True)  # see feedback_cache.cache_key
+    feedback = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,160 @@
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+PRUNE_EVERY = 100  # puts between table prunes
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    # The tokenizer lower-cases anyway, so "Sedih " and "sedih" share an entry
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def model_fingerprint(model_path, variant=None):
+    # Changes whenever config.json or the weights file is replaced, or the
+    # model is served in a different numeric mode (e.g. int8)
+    digest = hashlib.sha256()
+    if variant:
+        digest.update(f"{variant}\0".encode())
+    with open(os.path.join(model_path, "config.json"), "rb") as f:
+        digest.update(f.read())
+    weights = os.path.join(model_path, "model.safetensors")
+    if os.path.exists(weights):
+        stat = os.stat(weights)
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+class PredictionCache:
+    def __init__(self, fingerprint, max_size=10000, persist_path=None, max_rows=100000):
+        self.fingerprint = fingerprint
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self._puts = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if persist_path:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, probabilities TEXT NOT NULL)"
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning("Prediction cache file %s unusable, keeping memory only: %s", persist_path, e)
+                self.persist_path = None
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.fingerprint}\0{normalize_text(text)}".encode()).hexdigest()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.persist_path)
+            self._local.conn = conn
+        return conn
+
+    def get(self, text):
+        if self.max_size <= 0:
+            return None
+        key = self.key(text)
+        with self._lock:
+            probs = self._entries.get(key)
+            if probs is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return probs
+
+        if self.persist_path:
+            # The file is shared by every worker; a locked or broken file is a miss
+            try:
+                row = self._connection().execute(
+                    "SELECT probabilities FROM predictions WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("Prediction cache read failed: %s", e)
+                row = None
+            if row:
+                probs = json.loads(row[0])
+                self._store(key, probs)
+                with self._lock:
+                    self.hits += 1
+                    self.persistent_hits += 1
+                return probs
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text, probs):
+        if self.max_size <= 0:
+            return
+        key = self.key(text)
+        self._store(key, probs)
+        if not self.persist_path:
+            return
+
+        with self._lock:
+            self._puts += 1
+            prune = self._puts % PRUNE_EVERY == 0
+        conn = self._connection()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO predictions (key, probabilities) VALUES (?, ?)",
+                (key, json.dumps(probs)),
+            )
+            if prune:
+                self._prune(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            # Skipping the write only costs a later recompute
+            conn.rollback()
+            logger.warning("Prediction cache write failed: %s", e)
+
+    def _prune(self, conn):
+        # REPLACE re-inserts, so rowid order is write order: keep the newest max_rows
+        conn.execute(
+            "DELETE FROM predictions WHERE rowid NOT IN "
+            "(SELECT rowid FROM predictions ORDER BY rowid DESC LIMIT ?)",
+            (self.max_rows,),
+        )
+
+    def _store(self, key, probs):
+        with self._lock:
+            self._entries[key] = probs
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.persistent_hits = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "fingerprint": self.fingerprint,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "persistent_hits": self.persistent_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "persistent": bool(self.persist_path),
+            }
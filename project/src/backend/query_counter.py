@@ -0,0 +1,120 @@
+from collections import Counter
+from functools import wraps
+import logging
+import os
+import re
+import time
+
+from flask import g, has_app_context, current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Counts SQL statements and DB time per request from SQLAlchemy engine events.
+# With SQL_QUERY_STATS=1 (or app.debug) every response gets X-DB-Queries /
+# X-DB-Time-Ms / Server-Timing headers and a log line. Handlers declare a
+# budget with @query_budget; SQL_QUERY_BUDGETS decides what an overrun does:
+#   warn  - log it (default)
+#   raise - raise QueryBudgetExceeded (also the default when app.testing)
+#   off   - skip the check
+
+SQL_QUERY_STATS = os.getenv("SQL_QUERY_STATS", "").lower() in ("1", "true", "yes")
+SQL_QUERY_BUDGETS = os.getenv("SQL_QUERY_BUDGETS", "")
+DEFAULT_MAX_REPEATS = 3  # same statement shape this often in one handler looks like N+1
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+
+def statement_shape(statement):
+    # Same statement with different parameters or IN-list lengths -> same shape
+    shape = re.sub(r"%\(\w+\)s|\?|\b\d+\b", "?", statement)
+    shape = re.sub(r"\(\?(?:, \?)*\)", "(?)", shape)
+    return re.sub(r"\s+", " ", shape).strip()
+
+
+def _current_stats():
+    return g.get("query_stats") if has_app_context() else None
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+    stats = _current_stats()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+def stats_enabled(app):
+    return SQL_QUERY_STATS or app.debug
+
+
+def budget_mode(app):
+    return SQL_QUERY_BUDGETS or ("raise" if app.testing else "warn")
+
+
+def init_app(app):
+    @app.before_request
+    def start_counting():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def report(response):
+        stats = g.pop("query_stats", None)
+        if stats is None or not stats_enabled(app):
+            return response
+        ms = round(stats.seconds * 1000, 2)
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = str(ms)
+        response.headers.add("Server-Timing", f"db;desc=\"{stats.count} queries\";dur={ms}")
+        logger.info("%s %s db_queries=%d db_ms=%.2f", request.method, request.path, stats.count, ms)
+        return response
+
+
+def query_budget(max_queries, max_repeats=DEFAULT_MAX_REPEATS):
+    """Declare how many statements a handler may issue, and how often one shape may repeat."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            stats = _current_stats()
+            mode = budget_mode(current_app)
+            if stats is None or mode == "off":
+                return fn(*args, **kwargs)
+
+            count_before, shapes_before = stats.count, stats.shapes.copy()
+            result = fn(*args, **kwargs)
+            used = stats.count - count_before
+            repeated = {shape: n for shape, n in (stats.shapes - shapes_before).items() if n > max_repeats}
+
+            problems = []
+            if used > max_queries:
+                problems.append(f"{used} queries (budget {max_queries})")
+            for shape, n in repeated.items():
+                problems.append(f"statement repeated {n}x (max {max_repeats}): {shape[:200]}")
+            if problems:
+                message = f"{fn.__name__}: " + "; ".join(problems)
+                if mode == "raise":
+                    raise QueryBudgetExceeded(message)
+                logger.warning("Query budget exceeded in %s", message)
+            return result
+        return wrapper
+    return decorator
@@ -2,11 +2,13 @@ from flask import Blueprint, jsonify
 from db import db
 from models import UserBadge, Badge, Response, User
 from sqlalchemy import func
+from query_counter import query_budget
 
 achievements_bp = Blueprint("achievements", __name__)
 
 
 @achievements_bp.route("/user/<int:user_id>/achievements", methods=["GET"])
+@query_budget(3)
 def get_achievements(user_id):
     try:
         rows = db.session.query(UserBadge, Badge).join(Badge, UserBadge.badge_id == Badge.id)\
@@ -33,6 +35,7 @@ def get_achievements(user_id):
 
 
 @achievements_bp.route("/user/<int:user_id>/upcoming-badges", methods=["GET"])
+@query_budget(3)
 def get_upcoming(user_id):
     try:
         earned_ids = db.session.query(UserBadge.badge_id).filter_by(user_id=user_id).subquery()
@@ -52,6 +55,7 @@ def get_upcoming(user_id):
 
 
 @achievements_bp.route("/user/<int:user_id>/summary", methods=["GET"])
+@query_budget(3)
 def get_summary(user_id):
     try:
         # ✅ Combine response + badge points
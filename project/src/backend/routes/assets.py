@@ -0,0 +1,14 @@
+from flask import Blueprint, send_from_directory
+import assets
+
+assets_bp = Blueprint("assets", __name__)
+
+# File names carry a content hash, so a URL never changes meaning
+ONE_YEAR = 365 * 24 * 3600
+
+@assets_bp.route(f"{assets.ASSET_URL_PREFIX}/<path:filename>", methods=["GET"])
+def get_asset(filename):
+    response = send_from_directory(assets.ASSET_DIR, filename, max_age=ONE_YEAR)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,11 @@
+from flask import Blueprint, jsonify
+from db import pool_metrics
+
+database_bp = Blueprint("database", __name__)
+
+@database_bp.route("/db/pool", methods=["GET"])
+def get_pool_metrics():
+    try:
+        return jsonify(pool_metrics()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
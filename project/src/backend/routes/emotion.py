@@ -1,23 +1,55 @@
 from flask import Blueprint, request, jsonify
-from transformers import BertTokenizer, BertForSequenceClassification
-import torch
+from inference import predict_text, predict_bucketed, cache, status, metrics, sequence_length
+from inference_metrics import peak_rss_mb
+import logging
 import os
 
 emotion = Blueprint("emotion", __name__)
+logger = logging.getLogger(__name__)
 
-# Load model & tokenizer ONCE
-model_path = os.path.join(os.path.dirname(__file__), "..", "emotion_model")
-model_path = os.path.abspath(model_path)
-tokenizer = BertTokenizer.from_pretrained(model_path)
-model = BertForSequenceClassification.from_pretrained(model_path)
-model.eval()
+MAX_BATCH_ITEMS = int(os.getenv("EMOTION_MAX_BATCH_ITEMS", "500"))
 
 @emotion.route("/predict", methods=["POST"])
 def predict():
     data = request.get_json()
     text = data.get("text", "")
-    inputs = tokenizer(text, return_tensors="pt", padding=True, truncation=True)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    probs = torch.sigmoid(outputs.logits).squeeze().tolist()
-    return jsonify({"probabilities": probs})
+    # Concurrent requests are grouped into one forward pass by the batcher
+    probs = predict_text(text)
+    response = jsonify({"probabilities": probs})
+
+    tokens = sequence_length(text)
+    if tokens is not None:
+        response.headers["X-Emotion-Tokens"] = str(tokens)
+        logger.debug("predict: %d tokens", tokens)
+    return response
+
+@emotion.route("/predict/batch", methods=["POST"])
+def predict_many():
+    data = request.get_json() or {}
+    texts = data.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({"error": "'texts' must be a list of strings"}), 400
+    if len(texts) > MAX_BATCH_ITEMS:
+        return jsonify({"error": f"Too many texts (max {MAX_BATCH_ITEMS})"}), 400
+
+    try:
+        # Probabilities come back in the same order as the input texts
+        probs = predict_bucketed(texts) if texts else []
+        return jsonify({"probabilities": probs}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@emotion.route("/predict/cache", methods=["GET"])
+def cache_stats():
+    return jsonify(cache.stats()), 200
+
+@emotion.route("/predict/ready", methods=["GET"])
+def ready():
+    # 503 until the model has been loaded (by warm-up or the first /predict)
+    info = status()
+    return jsonify(info), 200 if info["ready"] else 503
+
+@emotion.route("/predict/metrics", methods=["GET"])
+def sequence_metrics():
+    # peak_rss_mb is this worker's high-water mark, for benchmark.py --mode http
+    return jsonify({**metrics.snapshot(), "peak_rss_mb": peak_rss_mb()}), 200
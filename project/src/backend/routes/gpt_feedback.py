@@ -1,25 +1,16 @@
-from flask import Blueprint, request, jsonify
-import openai
-import os
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
+from db import db
+from models import Response
+import feedback_cache
+import feedback_jobs
+import llm
+import json
 
 gpt = Blueprint("gpt", __name__)
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
-@gpt.route("/gpt-feedback", methods=["POST"])
-def gpt_feedback():
-    data = request.json
-    answer = data.get("answer", "")
-    expected_emotions = data.get("expected_emotions", [])
-    is_correct = data.get("is_correct", False)
-    narrative_text = data.get("narrative", "")
-    segment = data.get("segment", "7-9")  # default to 7-9 if not provided
-
-    # ⛔️ Don't give GPT feedback early for segment 2
-    if segment == "10-12" and not data.get("followup", False):
-        return jsonify({"feedback": None})
-
-    prompt = f"""
+def build_prompt(narrative_text, answer, expected_emotions, is_correct):
+    return f"""
 Kamu adalah mentor untuk anak usia 7–12 tahun. Tugasmu adalah memberikan umpan balik positif dan edukatif agar anak bisa mengenali emosi dengan lebih baik.
 
 Cerita yang dibaca anak adalah:
@@ -41,17 +32,171 @@ Buatlah umpan balik singkat dalam 2-3 kalimat yang:
 Jawabanmu akan langsung dibaca oleh anak tersebut.
 """
 
+
+def feedback_messages(narrative_text, answer, expected_emotions, is_correct):
+    return [
+        {"role": "system", "content": "Kamu adalah mentor ramah dan membimbing anak-anak dengan sabar."},
+        {"role": "user", "content": build_prompt(narrative_text, answer, expected_emotions, is_correct)}
+    ]
+
+
+def generate_feedback(narrative_text, answer, expected_emotions, is_correct, predicted_emotions=None):
+    key = feedback_cache.cache_key(narrative_text, answer, expected_emotions, is_correct, predicted_emotions)
+    feedback = feedback_cache.cache.get(key)
+    if feedback is not None:
+        return feedback
+
+    feedback = llm.get_client().complete(
+        feedback_messages(narrative_text, answer, expected_emotions, is_correct),
+        temperature=0.7,
+        max_tokens=200
+    )
+    feedback_cache.cache.put(key, feedback)
+    return feedback
+
+
+def cached_feedback(narrative_text, answer, expected_emotions, is_correct, predicted_emotions=None):
+    return feedback_cache.cache.get(
+        feedback_cache.cache_key(narrative_text, answer, expected_emotions, is_correct, predicted_emotions))
+
+
+@gpt.route("/gpt-feedback", methods=["POST"])
+def gpt_feedback():
+    data = request.json
+    answer = data.get("answer", "")
+    expected_emotions = data.get("expected_emotions", [])
+    is_correct = data.get("is_correct", False)
+    narrative_text = data.get("narrative", "")
+    segment = data.get("segment", "7-9")  # default to 7-9 if not provided
+
+    # ⛔️ Don't give GPT feedback early for segment 2
+    if segment == "10-12" and not data.get("followup", False):
+        return jsonify({"feedback": None})
+
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Kamu adalah mentor ramah dan membimbing anak-anak dengan sabar."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=200
-        )
-        feedback = response.choices[0].message.content.strip()
+        # With a saved response the feedback is generated in the background and
+        # written to that response; poll /feedback-jobs/<job_id> for it
+        # A cached answer is returned (and saved) straight away
+        response_id = data.get("response_id")
+        predicted_emotions = data.get("predicted_emotions")
+        if response_id:
+            # Cache first: it checks out its own connection, so look it up
+            # before the session holds one
+            feedback = cached_feedback(narrative_text, answer, expected_emotions, is_correct, predicted_emotions)
+            response = db.session.get(Response, response_id)
+            if not response:
+                return jsonify({"error": "Response not found"}), 404
+            if feedback is not None:
+                response.feedback = feedback
+                db.session.commit()
+                return jsonify({"feedback": feedback})
+            job = feedback_jobs.enqueue_feedback(current_app._get_current_object(), response_id,
+                                                 narrative_text, answer, expected_emotions, is_correct,
+                                                 predicted_emotions)
+            return jsonify({"job_id": job["id"], "status": job["status"]}), 202
+
+        feedback = generate_feedback(narrative_text, answer, expected_emotions, is_correct, predicted_emotions)
         return jsonify({"feedback": feedback})
+    except llm.LLMError as e:
+        # Still rate limited / overloaded after retries: tell the client to back off
+        status = 503 if e.retryable else 502
+        headers = {"Retry-After": str(int(e.retry_after or 1))} if e.retryable else {}
+        return jsonify({"error": str(e)}), status, headers
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@gpt.route("/gpt-feedback/stream", methods=["POST"])
+def gpt_feedback_stream():
+    # Same inputs as /gpt-feedback, answered as server-sent events: "token"
+    # events with text as it is generated, then "done" with the full feedback
+    # (saved on response_id when given) or "error"
+    data = request.json or {}
+    answer = data.get("answer", "")
+    expected_emotions = data.get("expected_emotions", [])
+    is_correct = data.get("is_correct", False)
+    narrative_text = data.get("narrative", "")
+    segment = data.get("segment", "7-9")
+    predicted_emotions = data.get("predicted_emotions")
+    response_id = data.get("response_id")
+
+    try:
+        if response_id and not db.session.get(Response, response_id):
+            return jsonify({"error": "Response not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        # Don't keep a pooled connection idle in transaction for the whole
+        # stream; the final save below checks out a fresh one
+        db.session.rollback()
+
+    key = feedback_cache.cache_key(narrative_text, answer, expected_emotions, is_correct, predicted_emotions)
+
+    def events():
+        if segment == "10-12" and not data.get("followup", False):
+            yield sse("done", {"feedback": None, "cached": False})
+            return
+        try:
+            feedback = feedback_cache.cache.get(key)
+            cached = feedback is not None
+            if cached:
+                yield sse("token", {"text": feedback})
+            else:
+                parts = []
+                messages = feedback_messages(narrative_text, answer, expected_emotions, is_correct)
+                for text in llm.get_client().stream(messages, temperature=0.7, max_tokens=200):
+                    parts.append(text)
+                    yield sse("token", {"text": text})
+                feedback = "".join(parts).strip()
+                feedback_cache.cache.put(key, feedback)
+
+            if response_id:
+                response = db.session.get(Response, response_id)
+                response.feedback = feedback
+                db.session.commit()
+            yield sse("done", {"feedback": feedback, "cached": cached})
+        except Exception as e:
+            db.session.rollback()
+            yield sse("error", {"error": str(e)})
+
+    return current_app.response_class(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@gpt.route("/feedback-jobs/<int:job_id>", methods=["GET"])
+def get_feedback_job(job_id):
+    try:
+        job = feedback_jobs.get_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@gpt.route("/gpt-feedback/cache", methods=["GET"])
+def get_feedback_cache_stats():
+    return jsonify(feedback_cache.cache.stats()), 200
+
+
+@gpt.route("/llm/metrics", methods=["GET"])
+def get_llm_metrics():
+    try:
+        client = llm.get_client()
+        return jsonify({
+            **client.metrics.snapshot(),
+            "max_in_flight": client.max_in_flight,
+            "requests_per_minute": llm.LLM_REQUESTS_PER_MINUTE,
+            "processes": llm.LLM_PROCESSES,
+            "process_requests_per_minute": client.limiter.rate * 60,
+            "max_retries": client.max_retries,
+        }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
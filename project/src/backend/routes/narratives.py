@@ -1,30 +1,33 @@
-from flask import Blueprint, request, jsonify
-from models import Narrative
-from db import db
+from flask import Blueprint, request, jsonify, Response
+import catalog
+from query_counter import query_budget
 
 narratives_bp = Blueprint("narratives", __name__)
 
 @narratives_bp.route("/narratives", methods=["GET"])
+@query_budget(3)
 def get_narratives():
     try:
         segment = request.args.get("segment", type=int)
         if segment is None:
             return jsonify({"error": "Missing 'segment' parameter"}), 400
 
-        rows = db.session.query(Narrative).filter_by(segment=segment).all()
+        body, etag = catalog.get_segment(segment)
 
-        results = []
-        for row in rows:
-            results.append({
-                "id": row.id,
-                "title": row.title,
-                "text": row.content,
-                "image_path": row.image_path,
-                "expectedEmotions": row.emotion_labels,
-                "segment": row.segment,
-            })
+        # Clients revalidate every time and usually get a 304 back
+        response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
 
-        return jsonify(results), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
+
+@narratives_bp.route("/narratives/publish", methods=["POST"])
+def publish_narratives():
+    try:
+        version = catalog.publish()
+        return jsonify({"version": version}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,144 +1,248 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from db import db
-from models import Response, Badge, UserBadge, User
+from models import Response, User, Narrative
 from datetime import datetime
-from sqlalchemy import func
-from sqlalchemy.orm import joinedload
+from sqlalchemy import tuple_
+from inference import predict_text, EMOTION_LABELS
+from scoring import predicted_labels, is_answer_correct, normalize_label, CORRECT_SCORE, apply_score_delta
+from badges import award_badges
+import stats
+from feedback_jobs import enqueue_feedback
+from routes.gpt_feedback import cached_feedback
+from query_counter import query_budget
+import base64
+import binascii
+import logging
 
 responses = Blueprint("responses", __name__)
+logger = logging.getLogger(__name__)
+
+def record_response(user_id, narrative_id, user_answer, predicted_emotion, is_correct, score, feedback):
+    response = Response(
+        user_id=user_id,
+        narrative_id=narrative_id,
+        user_answer=user_answer,
+        predicted_emotion=predicted_emotion,
+        is_correct=is_correct,
+        score=score,
+        repeatable=False,
+        flagged=False,
+        feedback=feedback,
+        created_at=datetime.utcnow()
+    )
+    db.session.add(response)
+
+    # Only assign score if it's correct and first time this narrative_id is answered correctly
+    already_correct = db.session.query(Response).filter_by(
+        user_id=user_id,
+        narrative_id=narrative_id,
+        is_correct=True
+    ).first()
+
+    if is_correct and not already_correct:
+        response.score = 10  # or your scoring logic
+
+    db.session.flush()
+    progress = stats.record_new_response(user_id, predicted_emotion, is_correct, response.score)
+    if is_correct:
+        apply_score_delta(user_id, response.score, "response", response_id=response.id)
+        award_badges(user_id, stats.counters(progress))
+
+    return response
+
 
 @responses.route("/responses", methods=["POST"])
+@query_budget(20)
 def save_response():
     data = request.json
     try:
-        response = Response(
+        response = record_response(
             user_id=data["user_id"],
             narrative_id=data["narrative_id"],
             user_answer=data["user_answer"],
             predicted_emotion=data["predicted_emotion"],
             is_correct=data["is_correct"],
             score=data.get("score", 0),
-            repeatable=False,
-            flagged=False,
             feedback=data["feedback"],
-            created_at=datetime.utcnow()
         )
-        db.session.add(response)
-
-        user = db.session.query(User).filter_by(id=data["user_id"]).first()
-
-        # Only assign score if it's correct and first time this narrative_id is answered correctly
-        already_correct = db.session.query(Response).filter_by(
-            user_id=data["user_id"],
-            narrative_id=data["narrative_id"],
-            is_correct=True
-        ).first()
-
-        if data["is_correct"] and not already_correct:
-            response.score = 10  # or your scoring logic
-            award_badges_if_needed(user.id)
-
-        # Recalculate total_score
-        if user:
-            response_score = db.session.query(func.sum(Response.score))\
-                .filter_by(user_id=user.id, is_correct=True).scalar() or 0
-
-            badge_score = db.session.query(func.sum(Badge.points))\
-                .join(UserBadge, UserBadge.badge_id == Badge.id)\
-                .filter(UserBadge.user_id == user.id).scalar() or 0
-
-            user.total_score = response_score + badge_score
-            award_badges_if_needed(user.id)
-
+        # Read before commit; afterwards it would cost a refresh query
+        response_id = response.id
         db.session.commit()
-        return jsonify({"id": response.id, "message": "Response saved"}), 200
+        return jsonify({"id": response_id, "message": "Response saved"}), 200
 
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 
-@responses.route("/user/<int:user_id>/responses", methods=["GET"])
-def get_user_responses(user_id):
-    try:
-        limit = request.args.get("limit", type=int)
+DEFAULT_FEEDBACK = "Terima kasih atas jawabanmu!"
 
-        query = db.session.query(Response)\
-            .options(joinedload(Response.narrative))\
-            .filter_by(user_id=user_id)\
-            .order_by(Response.created_at.desc())
 
-        if limit:
-            query = query.limit(limit)
+@responses.route("/responses/submit", methods=["POST"])
+@query_budget(20)
+def submit_answer():
+    data = request.json or {}
+    user_id = data.get("user_id")
+    narrative_id = data.get("narrative_id")
+    answer = (data.get("answer") or "").strip()
 
-        rows = query.all()
+    if not user_id or not narrative_id or not answer:
+        return jsonify({"error": "Missing user_id, narrative_id or answer"}), 400
 
-        data = []
-        for r in rows:
-            data.append({
-                'id': r.id,
-                'narrative_id': r.narrative_id,
-                'narrative': {
-                    'title': r.narrative.title,
-                    'content': r.narrative.content
-                },
-                'user_answer': r.user_answer,
-                'predicted_emotion': r.predicted_emotion,
-                'expected_emotions': r.narrative.emotion_labels,
-                'narrative_text': r.narrative.content,
-                'is_correct': r.is_correct,
-                'feedback': r.feedback,
-                'score': r.score,
-                'repeatable': r.repeatable,
-                'response_id': r.id,
-                'created_at': r.created_at.isoformat(),
-                'flagged': r.flagged
-            })
-
-        return jsonify(data), 200
+    try:
+        user = db.session.get(User, user_id)
+        narrative = db.session.get(Narrative, narrative_id)
+        if not user or not narrative:
+            return jsonify({"error": "User or narrative not found"}), 404
+        segment = user.segment
+        narrative_text = narrative.content
+        expected = [normalize_label(label) for label in narrative.emotion_labels]
+        # Hand the connection back while the classifier runs (up to
+        # EMOTION_PREDICT_TIMEOUT); record_response checks out a fresh one
+        db.session.rollback()
+
+        probabilities = predict_text(answer)
+        predicted = predicted_labels(probabilities, EMOTION_LABELS)
+        is_correct = is_answer_correct(predicted, expected)
+
+        # Segment 2 gets GPT feedback only after the follow-up question
+        wants_feedback = bool(data.get("feedback", True)) and segment != 2
+        feedback = None
+        if wants_feedback:
+            feedback = cached_feedback(narrative_text, answer, expected, is_correct, predicted)
+
+        response = record_response(
+            user_id=user_id,
+            narrative_id=narrative_id,
+            user_answer=answer,
+            predicted_emotion=predicted,
+            is_correct=is_correct,
+            score=CORRECT_SCORE if is_correct else 0,
+            feedback=feedback or DEFAULT_FEEDBACK,
+        )
+        saved = {"id": response.id, "score": response.score, "feedback": response.feedback}
+        db.session.commit()
+
+        feedback_pending = wants_feedback and feedback is None
+        job = None
+        if feedback_pending:
+            # The answer is already saved: a 500 here would make the client
+            # retry and record it twice, so it just goes without GPT feedback
+            try:
+                job = enqueue_feedback(current_app._get_current_object(), saved["id"],
+                                       narrative_text, answer, expected, is_correct, predicted)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Could not queue feedback for response %s", saved["id"])
+                feedback_pending = False
+
+        return jsonify({
+            "id": saved["id"],
+            "probabilities": probabilities,
+            "predicted_emotion": predicted,
+            "expected_emotions": expected,
+            "is_correct": is_correct,
+            "score": saved["score"],
+            "feedback": saved["feedback"],
+            "feedback_pending": feedback_pending,
+            "feedback_job_id": job["id"] if job else None,
+        }), 200
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-# === BADGE LOGIC ===
 
-def already_has_badge(user_id, badge_id):
-    return db.session.query(UserBadge).filter_by(user_id=user_id, badge_id=badge_id).first() is not None
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
 
-def award_badges_if_needed(user_id):
-    def grant(badge_id, badge_point):
-        if not already_has_badge(user_id, badge_id):
-            db.session.add(UserBadge(user_id=user_id, badge_id=badge_id))
-            user = db.session.query(User).filter_by(id=user_id).first()
-            if user:
-                user.total_score += badge_point
+# Fields a history row can carry; ?fields= picks a subset. Narrative bodies
+# are not repeated per row: they come once per page in "narratives".
+RESPONSE_FIELDS = {
+    'id': Response.id,
+    'narrative_id': Response.narrative_id,
+    'user_answer': Response.user_answer,
+    'predicted_emotion': Response.predicted_emotion,
+    'is_correct': Response.is_correct,
+    'feedback': Response.feedback,
+    'score': Response.score,
+    'repeatable': Response.repeatable,
+    'flagged': Response.flagged,
+    'created_at': Response.created_at,
+}
 
-    correct_count = db.session.query(func.count(Response.id))\
-        .filter_by(user_id=user_id, is_correct=True).scalar() or 0
 
-    total_score = db.session.query(func.sum(Response.score))\
-        .filter_by(user_id=user_id, is_correct=True).scalar() or 0
+def encode_cursor(created_at, response_id):
+    raw = f"{created_at.isoformat()}|{response_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-    emotion_types = db.session.query(func.unnest(Response.predicted_emotion))\
-        .filter(Response.user_id == user_id, Response.is_correct == True)\
-        .distinct().all()
-    emotion_set = set([e[0].lower() for e in emotion_types])
 
-    if correct_count >= 1: grant(1, 10)
-    if correct_count >= 5: grant(2, 20)
-    if correct_count >= 10: grant(3, 30)
-    if correct_count >= 20: grant(4, 40)
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    created_at, response_id = raw.split("|")
+    return datetime.fromisoformat(created_at), int(response_id)
 
-    if total_score >= 100: grant(5, 20)
-    if total_score >= 200: grant(6, 30)
-    if total_score >= 500: grant(7, 50)
-    if total_score >= 1000: grant(8, 100)
 
-    if len(emotion_set) >= 3: grant(9, 25)
-    if len(emotion_set) == 6: grant(10, 50)
+@responses.route("/user/<int:user_id>/responses", methods=["GET"])
+@query_budget(3)
+def get_user_responses(user_id):
+    # Newest first, keyset-paginated on (created_at, id):
+    #   ?limit=20&cursor=<next_cursor>&fields=narrative_id,created_at,repeatable
+    limit = request.args.get("limit", type=int) or DEFAULT_PAGE_SIZE
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    fields = request.args.get("fields")
+    fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(RESPONSE_FIELDS)
+    unknown = [f for f in fields if f not in RESPONSE_FIELDS]
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            cursor = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    try:
+        # Paging needs created_at/id even if the caller didn't ask for them
+        wanted = list(dict.fromkeys(fields + ['id', 'created_at', 'narrative_id']))
+        query = db.session.query(*(RESPONSE_FIELDS[f].label(f) for f in wanted))\
+            .filter(Response.user_id == user_id)\
+            .order_by(Response.created_at.desc(), Response.id.desc())
+        if cursor:
+            query = query.filter(tuple_(Response.created_at, Response.id) < tuple_(*cursor))
+
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        items = []
+        for r in rows:
+            item = {f: getattr(r, f) for f in fields}
+            if 'created_at' in item:
+                item['created_at'] = r.created_at.isoformat()
+            items.append(item)
+
+        narratives = {}
+        if request.args.get("narratives", "1") != "0":
+            narrative_ids = {r.narrative_id for r in rows}
+            for n in db.session.query(Narrative.id, Narrative.title, Narrative.content, Narrative.emotion_labels)\
+                    .filter(Narrative.id.in_(narrative_ids)):
+                narratives[n.id] = {
+                    'title': n.title,
+                    'content': n.content,
+                    'emotion_labels': n.emotion_labels,
+                }
+
+        return jsonify({
+            'items': items,
+            'narratives': narratives,
+            'next_cursor': encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+        }), 200
 
-    if "happy" in emotion_set: grant(11, 15)
-    if "envy" in emotion_set: grant(12, 15)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 # === CORRECTION ROUTES ===
 
@@ -152,16 +256,11 @@ def override_correct(id):
         if not response.is_correct:
             response.is_correct = True
             response.score = 10
-
-            user = db.session.query(User).filter_by(id=response.user_id).first()
-            if user:
-                response_score = db.session.query(func.sum(Response.score))\
-                    .filter_by(user_id=user.id, is_correct=True).scalar() or 0
-                badge_score = db.session.query(func.sum(Badge.points))\
-                    .join(UserBadge, UserBadge.badge_id == Badge.id)\
-                    .filter(UserBadge.user_id == user.id).scalar() or 0
-                user.total_score = response_score + badge_score
-                award_badges_if_needed(user.id)
+            # user_progress before users, the order record_response takes them in
+            progress = stats.record_correctness_change(
+                response.user_id, response.predicted_emotion, response.score, sign=1)
+            apply_score_delta(response.user_id, response.score, "override", response_id=response.id)
+            award_badges(response.user_id, stats.counters(progress))
 
         db.session.commit()
         return jsonify({"message": "Marked as correct."}), 200
@@ -178,18 +277,12 @@ def override_incorrect(id):
             return jsonify({"error": "Response not found"}), 404
 
         if response.is_correct:
+            old_score = response.score
             response.is_correct = False
             response.score = 0
-
-            user = db.session.query(User).filter_by(id=response.user_id).first()
-            if user:
-                response_score = db.session.query(func.sum(Response.score))\
-                    .filter_by(user_id=user.id, is_correct=True).scalar() or 0
-                badge_score = db.session.query(func.sum(Badge.points))\
-                    .join(UserBadge, UserBadge.badge_id == Badge.id)\
-                    .filter(UserBadge.user_id == user.id).scalar() or 0
-                user.total_score = response_score + badge_score
-                award_badges_if_needed(user.id)
+            # Badges already earned are kept, so there is nothing to award here
+            stats.record_correctness_change(response.user_id, response.predicted_emotion, old_score, sign=-1)
+            apply_score_delta(response.user_id, -old_score, "override", response_id=response.id)
 
         db.session.commit()
         return jsonify({"message": "Marked as incorrect."}), 200
@@ -284,16 +377,7 @@ def add_followup_to_response(id):
         response.feedback = data.get("feedback", response.feedback)
 
         # optional: add response.strategy = data.get("strategy") if you support that
-
-        user = db.session.query(User).filter_by(id=response.user_id).first()
-        if user:
-            response_score = db.session.query(func.sum(Response.score))\
-                .filter_by(user_id=user.id, is_correct=True).scalar() or 0
-            badge_score = db.session.query(func.sum(Badge.points))\
-                .join(UserBadge, UserBadge.badge_id == Badge.id)\
-                .filter(UserBadge.user_id == user.id).scalar() or 0
-            user.total_score = response_score + badge_score
-            award_badges_if_needed(user.id)
+        # Feedback doesn't change the score, so the ledger is left alone here
 
         db.session.commit()
         return jsonify({"message": "Follow-up added"}), 200
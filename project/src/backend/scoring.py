@@ -0,0 +1,71 @@
+from db import db
+from models import User, ScoreLedgerEntry
+from sqlalchemy import func, update
+import os
+
+# Server-side version of the correctness check Learn.tsx does on the client
+EMOTION_THRESHOLD = float(os.getenv("EMOTION_THRESHOLD", "0.5"))
+CORRECT_SCORE = 10
+
+# Narratives may store labels in Indonesian; the classifier speaks English
+LABEL_ALIASES = {
+    "senang": "happy",
+    "sedih": "sad",
+    "marah": "angry",
+    "iri": "envy",
+    "malu": "embarrassed",
+    "takut": "fear",
+}
+
+
+def normalize_label(label):
+    label = label.strip().lower()
+    return LABEL_ALIASES.get(label, label)
+
+
+def predicted_labels(probabilities, labels, threshold=EMOTION_THRESHOLD):
+    return [label for label, prob in zip(labels, probabilities) if prob > threshold]
+
+
+def is_answer_correct(predicted, expected):
+    expected = {normalize_label(label) for label in expected}
+    return any(normalize_label(label) in expected for label in predicted)
+
+
+# === SCORE LEDGER ===
+# users.total_score is kept as a running total: every change is written as a
+# ledger row plus an in-place increment, inside the caller's transaction,
+# instead of re-summing the user's whole history on each write.
+
+def apply_score_delta(user_id, delta, reason, response_id=None, badge_id=None):
+    if not delta:
+        return
+    db.session.add(ScoreLedgerEntry(
+        user_id=user_id,
+        delta=delta,
+        reason=reason,
+        response_id=response_id,
+        badge_id=badge_id,
+    ))
+    _increment_total(user_id, delta)
+
+
+def credit_badges(user_id, badges):
+    # One ledger row per badge, one UPDATE for the lot
+    total = 0
+    for badge_id, points in badges:
+        if points:
+            db.session.add(ScoreLedgerEntry(user_id=user_id, delta=points, reason="badge", badge_id=badge_id))
+            total += points
+    if total:
+        _increment_total(user_id, total)
+
+
+def _increment_total(user_id, delta):
+    # Increment in SQL so concurrent writes for the same user can't lose updates
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(total_score=func.coalesce(User.total_score, 0) + delta)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,177 @@
+from sqlalchemy import func, select, distinct
+from sqlalchemy.dialects.postgresql import array, insert
+
+from db import db
+from models import Response, User, UserProgress, UserEmotionStat
+
+STATS_EMOTIONS = ['happy', 'sad', 'angry', 'embarrassed', 'fear', 'envy']
+
+# Per-user counters (user_progress) and per-emotion attempt/correct counts
+# (user_emotion_stats) are updated in the same transaction as each response
+# write, so reading a child's statistics never scans their responses.
+# A user without a user_progress row hasn't been materialized yet; the first
+# write for them builds both tables from their existing responses.
+
+
+def _emotions(predicted_emotion):
+    return {emotion.lower() for emotion in predicted_emotion or []}
+
+
+def compute_user_stats(user_id):
+    # Straight from the responses table in a single round-trip: FILTERed
+    # counts per emotion plus the stored total score
+    correct = Response.is_correct == True
+    columns = [
+        func.count(Response.id).label("total_attempted"),
+        func.count(Response.id).filter(correct).label("total_correct"),
+    ]
+    for emotion in STATS_EMOTIONS:
+        has_emotion = Response.predicted_emotion.op("@>")(array([emotion]))
+        columns.append(func.count(Response.id).filter(has_emotion))
+        columns.append(func.count(Response.id).filter(has_emotion & correct))
+    total_score = select(User.total_score).where(User.id == user_id).scalar_subquery()
+
+    row = db.session.query(*columns, total_score).filter(Response.user_id == user_id).one()
+
+    per_emotion = [
+        {'emotion': emotion, 'total': row[2 + 2 * i], 'correct': row[3 + 2 * i]}
+        for i, emotion in enumerate(STATS_EMOTIONS)
+    ]
+    return {
+        'total_attempted': row.total_attempted,
+        'total_correct': row.total_correct,
+        'per_emotion': per_emotion,
+        'total_score': row[-1] or 0,
+    }
+
+
+def get_user_stats(user_id):
+    rows = db.session.query(
+        User.total_score,
+        UserProgress.attempt_count,
+        UserProgress.correct_count,
+        UserEmotionStat.emotion,
+        UserEmotionStat.attempted,
+        UserEmotionStat.correct,
+    ).outerjoin(UserProgress, UserProgress.user_id == User.id)\
+        .outerjoin(UserEmotionStat, UserEmotionStat.user_id == User.id)\
+        .filter(User.id == user_id).all()
+
+    if not rows or rows[0].attempt_count is None:
+        # Not materialized yet (no writes since the tables were added)
+        return compute_user_stats(user_id)
+
+    by_emotion = {row.emotion: row for row in rows if row.emotion}
+    return {
+        'total_attempted': rows[0].attempt_count,
+        'total_correct': rows[0].correct_count,
+        'per_emotion': [
+            {
+                'emotion': emotion,
+                'total': by_emotion[emotion].attempted if emotion in by_emotion else 0,
+                'correct': by_emotion[emotion].correct if emotion in by_emotion else 0,
+            }
+            for emotion in STATS_EMOTIONS
+        ],
+        'total_score': rows[0].total_score or 0,
+    }
+
+
+def counters(progress):
+    # What badge rules are evaluated against
+    emotions = {emotion for (emotion,) in db.session.query(UserEmotionStat.emotion)
+                .filter(UserEmotionStat.user_id == progress.user_id, UserEmotionStat.correct > 0)}
+    return {
+        "correct_count": progress.correct_count,
+        "correct_score": progress.correct_score,
+        "emotions": emotions,
+    }
+
+
+def rebuild_user_stats(user_id):
+    # Two first writes for the same user can both land here: ON CONFLICT lets
+    # the second wait for the first's row instead of failing on the primary
+    # key, and counting only after the lock sees both responses
+    db.session.execute(
+        insert(UserProgress).values(user_id=user_id).on_conflict_do_nothing(index_elements=[UserProgress.user_id])
+    )
+    progress = _locked_progress(user_id)
+
+    correct = Response.is_correct == True
+    attempt_count, correct_count, correct_score = db.session.query(
+        func.count(Response.id),
+        func.count(Response.id).filter(correct),
+        func.coalesce(func.sum(Response.score).filter(correct), 0),
+    ).filter(Response.user_id == user_id).one()
+
+    progress.attempt_count = attempt_count
+    progress.correct_count = correct_count
+    progress.correct_score = correct_score
+
+    # unnest + FILTER: one grouped pass for every emotion's totals
+    unnested = db.session.query(
+        Response.id.label("id"),
+        Response.is_correct.label("is_correct"),
+        func.lower(func.unnest(Response.predicted_emotion)).label("emotion"),
+    ).filter(Response.user_id == user_id).subquery()
+    per_emotion = db.session.query(
+        unnested.c.emotion,
+        func.count(distinct(unnested.c.id)),
+        func.count(distinct(unnested.c.id)).filter(unnested.c.is_correct == True),
+    ).group_by(unnested.c.emotion).all()
+
+    db.session.query(UserEmotionStat).filter_by(user_id=user_id).delete(synchronize_session=False)
+    db.session.add_all([
+        UserEmotionStat(user_id=user_id, emotion=emotion, attempted=attempted, correct=correct_n)
+        for emotion, attempted, correct_n in per_emotion
+    ])
+    db.session.flush()
+    return progress
+
+
+def _locked_progress(user_id):
+    # Callers change the Response first; flushing here means a user without a
+    # progress row gets one built from responses that already include it
+    db.session.flush()
+    return db.session.query(UserProgress).filter_by(user_id=user_id).with_for_update().first()
+
+
+def _bump_emotions(user_id, emotions, attempted, correct):
+    if not emotions:
+        return
+    stmt = insert(UserEmotionStat).values([
+        {"user_id": user_id, "emotion": emotion, "attempted": max(attempted, 0), "correct": max(correct, 0)}
+        for emotion in emotions
+    ])
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[UserEmotionStat.user_id, UserEmotionStat.emotion],
+        set_={
+            "attempted": UserEmotionStat.attempted + attempted,
+            "correct": UserEmotionStat.correct + correct,
+        },
+    ))
+
+
+def record_new_response(user_id, predicted_emotion, is_correct, score):
+    progress = _locked_progress(user_id)
+    if progress is None:
+        return rebuild_user_stats(user_id)
+
+    progress.attempt_count += 1
+    if is_correct:
+        progress.correct_count += 1
+        progress.correct_score += score or 0
+    _bump_emotions(user_id, _emotions(predicted_emotion), 1, 1 if is_correct else 0)
+    return progress
+
+
+def record_correctness_change(user_id, predicted_emotion, score, sign):
+    # sign=1 when a response is overridden to correct, -1 for incorrect
+    progress = _locked_progress(user_id)
+    if progress is None:
+        return rebuild_user_stats(user_id)
+
+    progress.correct_count += sign
+    progress.correct_score += sign * (score or 0)
+    _bump_emotions(user_id, _emotions(predicted_emotion), 0, sign)
+    return progress
@@ -0,0 +1,77 @@
+from functools import lru_cache
+import os
+
+from prediction_cache import normalize_text
+
+# Turns answers into padded model inputs. The fast path uses the Rust
+# `tokenizers` WordPiece implementation directly on vocab.txt, so serving from
+# an exported graph doesn't need transformers at all. Encodings are cached per
+# normalized string since children repeat the same short answers.
+
+MAX_POSITIONS = 512
+
+
+class Encoder:
+    def __init__(self, encode_ids, pad_id=0, cache_size=20000, max_length=MAX_POSITIONS):
+        self.pad_id = pad_id
+        self.max_length = max_length
+        self._encode_cached = lru_cache(maxsize=cache_size)(encode_ids)
+
+    def raw_length(self, text):
+        return len(self._encode_cached(normalize_text(text)))
+
+    def encode(self, text):
+        ids = self._encode_cached(normalize_text(text))
+        if len(ids) > self.max_length:
+            # Keep [CLS] ... [SEP] framing when cutting long answers
+            ids = ids[:self.max_length - 1] + ids[-1:]
+        return ids
+
+    def batch(self, texts, tensor_type="pt"):
+        encoded = [self.encode(text) for text in texts]
+        width = max((len(ids) for ids in encoded), default=0)
+        input_ids = [list(ids) + [self.pad_id] * (width - len(ids)) for ids in encoded]
+        attention_mask = [[1] * len(ids) + [0] * (width - len(ids)) for ids in encoded]
+        token_type_ids = [[0] * width for _ in encoded]
+
+        if tensor_type == "pt":
+            import torch
+            to_tensor = lambda rows: torch.tensor(rows, dtype=torch.long)
+        else:
+            import numpy as np
+            to_tensor = lambda rows: np.array(rows, dtype=np.int64)
+        return {
+            "input_ids": to_tensor(input_ids),
+            "attention_mask": to_tensor(attention_mask),
+            "token_type_ids": to_tensor(token_type_ids),
+        }
+
+    def cache_info(self):
+        info = self._encode_cached.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
+
+def fast_encode_fn(model_path):
+    from tokenizers import BertWordPieceTokenizer
+
+    # Same normalization as the slow BertTokenizer in tokenizer_config.json
+    tokenizer = BertWordPieceTokenizer(
+        os.path.join(model_path, "vocab.txt"),
+        lowercase=True,
+        strip_accents=None,
+        clean_text=True,
+        handle_chinese_chars=True,
+    )
+    return lambda text: tuple(tokenizer.encode(text).ids)
+
+
+def slow_encode_fn(model_path):
+    from transformers import BertTokenizer
+
+    tokenizer = BertTokenizer.from_pretrained(model_path)
+    return lambda text: tuple(tokenizer(text)["input_ids"])
+
+
+def load_encoder(model_path, fast=True, cache_size=20000, max_length=MAX_POSITIONS):
+    encode_ids = fast_encode_fn(model_path) if fast else slow_encode_fn(model_path)
+    return Encoder(encode_ids, cache_size=cache_size, max_length=max_length)
@@ -4,6 +4,7 @@ import Button from "./ui/Button";
 import { motion, AnimatePresence } from "framer-motion";
 import { CheckCircle, XCircle, RotateCcw, X } from "lucide-react";
 import ConfirmPINModal from "./modals/ConfirmPINModal";
+import { fetchAllResponses } from "../utils/responses";
 
 const API = import.meta.env.VITE_API_BASE;
 
@@ -31,8 +32,7 @@ const NarrativeTileGrid: React.FC = () => {
 
   const refetchTiles = async () => {
     if (!user) return;
-    const res = await fetch(`${API}/user/${user.id}/responses`);
-    const data = await res.json();
+    const data = await fetchAllResponses(user.id);
 
     const latest = data.reduce((acc, item) => {
       const existing = acc[item.narrative_id];
@@ -5,6 +5,7 @@ import Card from "../components/ui/Card";
 import Button from "../components/ui/Button";
 import { useAuth } from "../context/AuthContext";
 import { Award, BookOpen, Trophy, BarChart2 } from "lucide-react";
+import { fetchRecentResponses } from "../utils/responses";
 
 const API = import.meta.env.VITE_API_BASE;
 
@@ -33,12 +34,11 @@ const Dashboard: React.FC = () => {
     const fetchDashboardData = async () => {
       if (!user) return;
 
-      const [responsesRes, statsRes] = await Promise.all([
-        fetch(`${API}/user/${user.id}/responses?limit=3`),
+      const [responseData, statsRes] = await Promise.all([
+        fetchRecentResponses(user.id, 3),
         fetch(`${API}/user/${user.id}/stats`),
       ]);
 
-      const responseData = await responsesRes.json();
       const statsData = await statsRes.json();
 
       setActivities(responseData);
@@ -6,6 +6,8 @@ import { useAuth } from "../context/AuthContext";
 import { Mic, Send, Award } from "lucide-react";
 import { Narrative, Emotion } from "../types";
 import toast, { Toaster } from "react-hot-toast";
+import { fetchAllResponses } from "../utils/responses";
+import { streamFeedback } from "../utils/feedback";
 
 const API = import.meta.env.VITE_API_BASE;
 
@@ -62,8 +64,11 @@ const Learn: React.FC = () => {
 
     const fetchNarratives = async () => {
       try {
-        const responsesRes = await fetch(`${API}/user/${user.id}/responses`);
-        const responsesData = await responsesRes.json();
+        const responsesData = await fetchAllResponses(user.id, [
+          "narrative_id",
+          "created_at",
+          "repeatable",
+        ]);
 
         const latestMap = new Map();
         responsesData.forEach((r: any) => {
@@ -159,24 +164,7 @@ const Learn: React.FC = () => {
       );
       const score = isCorrect ? 10 : 0;
 
-      let feedback = "Terima kasih atas jawabanmu!";
-
-      if (!isSegment2) {
-        const gptRes = await fetch(`${API}/gpt-feedback`, {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({
-            answer: userAnswer,
-            expected_emotions: correctEmotions,
-            is_correct: isCorrect,
-            narrative: currentNarrative.text,
-          }),
-        });
-
-        const gptData = await gptRes.json();
-        feedback = gptData.feedback || feedback;
-      }
-
+      const feedback = "Terima kasih atas jawabanmu!";
       setResult({ predictedEmotions, feedback, score, isCorrect });
 
       const responseRes = await fetch(`${API}/responses`, {
@@ -196,6 +184,30 @@ const Learn: React.FC = () => {
       const resData = await responseRes.json();
       setResponseId(resData.id);
 
+      // GPT feedback streams in word by word and is saved on the response
+      if (!isSegment2) {
+        // Ignore it if the child has already moved on to another story
+        const showFeedback = (text: string) =>
+          setResult((prev) =>
+            prev && prev.predictedEmotions === predictedEmotions
+              ? { ...prev, feedback: text }
+              : prev
+          );
+        streamFeedback(
+          resData.id,
+          {
+            answer: userAnswer,
+            expected_emotions: correctEmotions,
+            predicted_emotions: predictedEmotions,
+            is_correct: isCorrect,
+            narrative: currentNarrative.text,
+          },
+          showFeedback
+        )
+          .then((gptFeedback) => gptFeedback && showFeedback(gptFeedback))
+          .catch((err) => console.error("❌ Error fetching feedback:", err));
+      }
+
       if (isSegment2) {
         setHasAnsweredEmotion(true);
         return;
@@ -224,33 +236,24 @@ const Learn: React.FC = () => {
   };
 
   const handleFollowupSubmit = async () => {
-    if (!userStrategy.trim() || !currentNarrative || !result || !user) return;
+    if (!userStrategy.trim() || !currentNarrative || !result || !user || !responseId)
+      return;
 
     try {
-      const gptRes = await fetch(`${API}/gpt-feedback`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
+      // The advice is also saved on the response once it has streamed in
+      const gptFeedback = await streamFeedback(
+        responseId,
+        {
           narrative: currentNarrative.text,
           answer: userStrategy,
           expected_emotions: currentNarrative.expectedEmotions,
           is_correct: result.isCorrect,
           segment: user.segment,
           followup: true,
-        }),
-      });
-
-      const gptData = await gptRes.json();
-      const feedback = gptData.feedback || "Terima kasih atas jawabanmu!";
-      setGptAdvice(feedback);
-
-      await fetch(`${API}/responses/${responseId}/add_followup`, {
-        method: "PATCH",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          feedback,
-        }),
-      });
+        },
+        setGptAdvice
+      );
+      setGptAdvice(gptFeedback || "Terima kasih atas jawabanmu!");
 
       const badgeCheck = await fetch(`${API}/user/${user.id}/achievements`);
       const latestBadges = await badgeCheck.json();
@@ -281,8 +284,11 @@ const Learn: React.FC = () => {
     if (!user || !narratives.length) return;
 
     try {
-      const fetchResponses = await fetch(`${API}/user/${user.id}/responses`);
-      const responseData = await fetchResponses.json();
+      const responseData = await fetchAllResponses(user.id, [
+        "narrative_id",
+        "created_at",
+        "repeatable",
+      ]);
 
       const latestMap = new Map();
       responseData.forEach((r: any) => {
@@ -450,6 +456,10 @@ const Learn: React.FC = () => {
             {currentNarrative.image_path && (
               <img
                 src={`/${currentNarrative.image_path}`}
+                srcSet={currentNarrative.image_variants
+                  ?.map((v) => `${API}${v.url} ${v.width}w`)
+                  .join(", ")}
+                sizes="(max-width: 640px) 100vw, 580px"
                 alt="Ilustrasi cerita"
                 className="w-[580px] h-auto rounded-md object-cover flex-shrink-0"
               />
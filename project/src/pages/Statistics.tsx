@@ -14,6 +14,7 @@ import {
   ResponsiveContainer,
 } from "recharts";
 import { BookOpen } from "lucide-react";
+import { fetchRecentResponses } from "../utils/responses";
 
 const API = import.meta.env.VITE_API_BASE;
 
@@ -46,13 +47,12 @@ const Statistics: React.FC = () => {
     const fetchStats = async () => {
       if (!user) return;
 
-      const [statRes, recentRes] = await Promise.all([
+      const [statRes, recentData] = await Promise.all([
         fetch(`${API}/user/${user.id}/stats`),
-        fetch(`${API}/user/${user.id}/responses?limit=5`),
+        fetchRecentResponses(user.id, 5),
       ]);
 
       const statsData = await statRes.json();
-      const recentData = await recentRes.json();
 
       setEmotionStats(statsData.per_emotion);
       setSummary({
@@ -20,11 +20,20 @@ export interface AuthFormData {
   role?: 'kid' | 'pendamping'; // ✅ Add this line
 }
 
+export interface ImageVariant {
+  url: string; // served by the backend, e.g. /assets/A1-640w.3fa9c1d2e4b7.webp
+  width: number;
+  height: number;
+  bytes: number;
+  type: string;
+}
+
 export interface Narrative {
   id: string; // character varying(10)
   title: string;
   content: string;
   image_path: string;
+  image_variants?: ImageVariant[]; // resized WebP copies, smallest first
   emotion_labels: Emotion[]; // array of emotion strings
   segment: number;
 }
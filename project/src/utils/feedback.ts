@@ -0,0 +1,88 @@
+const API = import.meta.env.VITE_API_BASE;
+
+const POLL_INTERVAL_MS = 1000;
+const POLL_TIMEOUT_MS = 30000;
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Queues GPT feedback for a saved response and polls until the background
+// job has written it; resolves to null if it fails or takes too long.
+export const requestFeedback = async (
+  responseId: number,
+  body: Record<string, unknown>
+): Promise<string | null> => {
+  const res = await fetch(`${API}/gpt-feedback`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ ...body, response_id: responseId }),
+  });
+  const data = await res.json();
+  if (data.feedback !== undefined) return data.feedback;
+  if (!data.job_id) return null;
+
+  return waitForFeedback(data.job_id);
+};
+
+export const waitForFeedback = async (jobId: number): Promise<string | null> => {
+  const deadline = Date.now() + POLL_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    await sleep(POLL_INTERVAL_MS);
+    const res = await fetch(`${API}/feedback-jobs/${jobId}`);
+    if (!res.ok) return null;
+    const job = await res.json();
+    if (job.status === "done") return job.feedback;
+    if (job.status === "failed") return null;
+  }
+  return null;
+};
+
+// Streams GPT feedback as it is generated, calling onText with the text so
+// far; the server saves the final text on the response. Falls back to the
+// job queue if the stream can't be read.
+export const streamFeedback = async (
+  responseId: number,
+  body: Record<string, unknown>,
+  onText: (text: string) => void
+): Promise<string | null> => {
+  try {
+    const res = await fetch(`${API}/gpt-feedback/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ ...body, response_id: responseId }),
+    });
+    if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let text = "";
+
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line
+      let end: number;
+      while ((end = buffer.indexOf("\n\n")) !== -1) {
+        const raw = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "{}");
+
+        if (event === "token") {
+          text += data.text;
+          onText(text);
+        } else if (event === "done") {
+          return data.feedback;
+        } else if (event === "error") {
+          throw new Error(data.error);
+        }
+      }
+    }
+    throw new Error("Stream ended early");
+  } catch (err) {
+    console.error("❌ Feedback stream failed, polling instead:", err);
+    return requestFeedback(responseId, body);
+  }
+};
@@ -0,0 +1,51 @@
+const API = import.meta.env.VITE_API_BASE;
+
+interface ResponsePage {
+  items: any[];
+  narratives: Record<
+    string,
+    { title: string; content: string; emotion_labels: string[] }
+  >;
+  next_cursor: string | null;
+}
+
+// The history API sends each narrative once per page; put its fields back on
+// the rows in the shape the pages already use.
+const attachNarratives = (page: ResponsePage) =>
+  page.items.map((item) => {
+    const narrative = page.narratives[item.narrative_id];
+    if (!narrative) return item;
+    return {
+      ...item,
+      narrative: { title: narrative.title, content: narrative.content },
+      expected_emotions: narrative.emotion_labels,
+      narrative_text: narrative.content,
+    };
+  });
+
+export const fetchRecentResponses = async (userId: number, limit: number) => {
+  const res = await fetch(`${API}/user/${userId}/responses?limit=${limit}`);
+  return attachNarratives(await res.json());
+};
+
+// Walks every page; pass `fields` to fetch only those columns (no narratives)
+export const fetchAllResponses = async (userId: number, fields?: string[]) => {
+  const rows: any[] = [];
+  let cursor: string | null = null;
+
+  do {
+    const params = new URLSearchParams({ limit: "200" });
+    if (fields) {
+      params.set("fields", fields.join(","));
+      params.set("narratives", "0");
+    }
+    if (cursor) params.set("cursor", cursor);
+
+    const res = await fetch(`${API}/user/${userId}/responses?${params}`);
+    const page: ResponsePage = await res.json();
+    rows.push(...attachNarratives(page));
+    cursor = page.next_cursor;
+  } while (cursor);
+
+  return rows;
+};